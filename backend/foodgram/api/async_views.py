@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Потоковые ответы остаются синхронными: Django 3.2 под ASGI перебирает их
+# в event loop, и отдать их из пула можно, только собрав файл целиком в
+# памяти.
+STREAMING_ACTIONS = {'download_shopping_cart'}
+
+executor = ThreadPoolExecutor(max_workers=settings.ASYNC_API_WORKERS,
+                              thread_name_prefix='async-api')
+
+
+def render_response(view, request, *args, **kwargs):
+    # Поток пула держит своё соединение с БД, закрываем его по правилам
+    # CONN_MAX_AGE так же, как Django делает это для обычного запроса.
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def as_async(view):
+    read = sync_to_async(render_response, thread_sensitive=False,
+                         executor=executor)
+    write = sync_to_async(view, thread_sensitive=True)
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await read(view, request, *args, **kwargs)
+        return await write(request, *args, **kwargs)
+    return async_view
+
+
+def is_async_pattern(pattern, viewsets):
+    callback = pattern.callback
+    return (getattr(callback, 'cls', None) in viewsets
+            and not STREAMING_ACTIONS.intersection(
+                getattr(callback, 'actions', {}).values()))
+
+
+def async_patterns(patterns, viewsets):
+    return [
+        URLPattern(pattern.pattern, as_async(pattern.callback),
+                   pattern.default_args, pattern.name)
+        if is_async_pattern(pattern, viewsets) else pattern
+        for pattern in patterns
+    ]
@@ -0,0 +1,119 @@
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import SAFE_METHODS
+
+from users.models import User
+
+TOKEN_KEY = 'auth_token:{digest}'
+# В кэш попадают только поля, нужные проверкам прав; остальные, включая
+# хэш пароля, при обращении догружаются из БД. Порядок - как в модели:
+# так значения ожидает Model.from_db.
+CACHED_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname in ('id', 'is_active', 'is_staff', 'is_superuser'))
+# Метка отозванного токена: пока она лежит в кэше, cache.add из запроса,
+# прочитавшего токен до отзыва, не вернет его обратно.
+REVOKED = 'revoked'
+
+
+class LocalTokenCache:
+    # Ограниченный LRU в памяти процесса. Записи живут недолго: удаление
+    # токена в другом процессе видно здесь не позже чем через
+    # TOKEN_CACHE_LOCAL_TIMEOUT секунд.
+    def __init__(self):
+        self._lock = Lock()
+        self._items = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, values = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return values
+
+    def set(self, key, values):
+        with self._lock:
+            self._items[key] = (
+                time.monotonic() + settings.TOKEN_CACHE_LOCAL_TIMEOUT, values)
+            self._items.move_to_end(key)
+            while len(self._items) > settings.TOKEN_CACHE_SIZE:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+
+local_tokens = LocalTokenCache()
+
+
+def token_cache_key(key):
+    # В общий кэш токен попадает только в виде хэша.
+    return TOKEN_KEY.format(digest=sha256(key.encode()).hexdigest())
+
+
+def get_token_user(key):
+    values = local_tokens.get(key)
+    if values is None:
+        values = cache.get(token_cache_key(key))
+        if not isinstance(values, tuple):
+            return None
+        local_tokens.set(key, values)
+    # Каждый запрос получает свой объект; поля вне CACHED_FIELDS отложены.
+    return User.from_db(DEFAULT_DB_ALIAS, CACHED_FIELDS, values)
+
+
+def set_token_user(key, user):
+    values = tuple(getattr(user, field) for field in CACHED_FIELDS)
+    if cache.add(token_cache_key(key), values, settings.TOKEN_CACHE_TIMEOUT):
+        local_tokens.set(key, values)
+
+
+def invalidate_token(key):
+    local_tokens.delete(key)
+    cache.set(token_cache_key(key), REVOKED, settings.TOKEN_REVOKED_TIMEOUT)
+
+
+def invalidate_tokens(keys):
+    for key in keys:
+        invalidate_token(key)
+
+
+def schedule_token_invalidation(keys):
+    # После коммита: до него другие соединения еще видят старые данные и
+    # могли бы вернуть их в кэш.
+    transaction.on_commit(lambda: invalidate_tokens(keys))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    # Безопасные запросы получают пользователя по токену из кэша без
+    # обращения к БД. Запросы на запись читают его из БД: представления
+    # могут сохранять request.user целиком.
+    def authenticate(self, request):
+        self.use_cache = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        user = get_token_user(key) if self.use_cache else None
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            set_token_user(key, user)
+            return user, token
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        return user, self.get_model()(key=key, user=user)
@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework import serializers, status
+from rest_framework.response import Response
+
+from api.carts import change_cart_summary
+from api.counters import change_counter
+from api.feed import backfill_timelines, drop_from_timelines
+from api.memberships import invalidate_author_ids, invalidate_recipe_ids
+from recipes.models import Cart, Recipe, Subscription
+from users.models import User
+
+# Пакетные версии избранного, корзины и подписок. Строки вставляются и
+# удаляются одним запросом в обход сигналов: обработчики post_save и
+# post_delete срабатывали бы по строке и повторяли бы для каждой запросы
+# к счетчикам, сводке корзины, кэшам и лентам. Поэтому все это обновляется
+# здесь же, один раз на пачку.
+CREATED = 'created'
+DELETED = 'deleted'
+EXISTS = 'exists'
+ABSENT = 'absent'
+NOT_FOUND = 'not_found'
+SELF = 'self_subscription'
+
+
+def get_ids(request):
+    ids = request.data.get('ids') if hasattr(request.data, 'get') else None
+    if (not isinstance(ids, list) or not ids
+            or len(ids) > settings.BULK_MAX_IDS
+            or not all(str(pk).isdecimal() and int(pk) > 0 for pk in ids)):
+        raise serializers.ValidationError(
+            {'ids': settings.NOT_LIST_IDS.format(
+                limit=settings.BULK_MAX_IDS)})
+    return list(dict.fromkeys(int(pk) for pk in ids))
+
+
+def bulk_response(ids, statuses):
+    return Response(
+        {'results': [{'id': pk, 'status': statuses[pk]} for pk in ids]},
+        status=status.HTTP_200_OK)
+
+
+def columns(model, owner, target):
+    quote = connection.ops.quote_name
+    return (quote(model._meta.db_table),
+            quote(model._meta.get_field(owner).column),
+            quote(model._meta.get_field(target).column))
+
+
+def insert_rows(model, owner, target, owner_id, target_ids):
+    # RETURNING после ON CONFLICT DO NOTHING отдает только действительно
+    # вставленные строки: из параллельных запросов с одинаковыми id каждую
+    # строку засчитывает ровно один.
+    if not target_ids:
+        return set()
+    table, owner_column, target_column = columns(model, owner, target)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({owner_column}, {target_column}) VALUES '
+            + ', '.join(['(%s, %s)'] * len(target_ids))
+            + f' ON CONFLICT DO NOTHING RETURNING {target_column}',
+            [value for pk in target_ids for value in (owner_id, pk)])
+        return {row[0] for row in cursor.fetchall()}
+
+
+def delete_rows(model, owner, target, owner_id, target_ids):
+    # Так же только строки, удаленные именно этим запросом.
+    if not target_ids:
+        return set()
+    table, owner_column, target_column = columns(model, owner, target)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {owner_column} = %s '
+            f'AND {target_column} IN ('
+            + ', '.join(['%s'] * len(target_ids))
+            + f') RETURNING {target_column}',
+            [owner_id, *target_ids])
+        return {row[0] for row in cursor.fetchall()}
+
+
+@transaction.atomic
+def bulk_favorite_cart(model, request):
+    ids = get_ids(request)
+    user_id = request.user.id
+    found = set(Recipe.custom_objects.filter(pk__in=ids).values_list(
+        'pk', flat=True))
+    targets = [pk for pk in ids if pk in found]
+    counter = f'{model._meta.default_related_name}_count'
+    if request.method == 'POST':
+        changed = insert_rows(model, 'user', 'recipe', user_id, targets)
+        statuses = {pk: CREATED if pk in changed else EXISTS for pk in found}
+        delta = 1
+    else:
+        changed = delete_rows(model, 'user', 'recipe', user_id, targets)
+        statuses = {pk: DELETED if pk in changed else ABSENT for pk in found}
+        delta = -1
+    statuses.update({pk: NOT_FOUND for pk in ids if pk not in found})
+    if changed:
+        change_counter(Recipe.custom_objects.filter(pk__in=changed),
+                       counter, delta)
+        if model is Cart:
+            change_cart_summary(user_id, changed, delta)
+        # Кэш сбрасывается после коммита: иначе параллельный GET успел бы
+        # снова закэшировать старый набор.
+        transaction.on_commit(lambda: invalidate_recipe_ids(model, user_id))
+    return bulk_response(ids, statuses)
+
+
+@transaction.atomic
+def bulk_subscribe(request):
+    ids = get_ids(request)
+    user_id = request.user.id
+    found = set(User.objects.filter(pk__in=ids).values_list('pk', flat=True))
+    targets = [pk for pk in ids if pk in found and pk != user_id]
+    if request.method == 'POST':
+        changed = insert_rows(Subscription, 'subscriber', 'author', user_id,
+                              targets)
+        statuses = {pk: CREATED if pk in changed else EXISTS for pk in found}
+        if user_id in found:
+            statuses[user_id] = SELF
+        timelines = backfill_timelines
+    else:
+        changed = delete_rows(Subscription, 'subscriber', 'author', user_id,
+                              targets)
+        statuses = {pk: DELETED if pk in changed else ABSENT for pk in found}
+        timelines = drop_from_timelines
+    statuses.update({pk: NOT_FOUND for pk in ids if pk not in found})
+    if changed:
+        transaction.on_commit(lambda: invalidate_author_ids(user_id))
+        transaction.on_commit(lambda: timelines(user_id, list(changed)))
+    return bulk_response(ids, statuses)
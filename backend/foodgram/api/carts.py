@@ -0,0 +1,130 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from recipes.models import Cart, CartIngredient, RecipeIngredient
+
+# Сводка корзины (CartIngredient) меняется на разницу в количестве продуктов:
+# при добавлении и удалении рецептов из корзины и при правке состава
+# рецепта, который уже лежит в чьих-то корзинах. Каждое изменение идет
+# одной транзакцией (внутри внешней - без лишней точки сохранения) и
+# начинается с записи, а не с чтения: внутри транзакции на SQLite чтение
+# перед записью не ждет блокировку, а сразу падает с "database is locked".
+
+
+def increment_rows(rows_sql, params):
+    # rows_sql отдает (user_id, ingredient_id, total). Строка вставляется
+    # сразу с настоящим количеством или увеличивается, если уже есть:
+    # промежуточных строк с нулем нет, и параллельное удаление опустевших
+    # строк не может забрать только что добавленную.
+    quote = connection.ops.quote_name
+    table = quote(CartIngredient._meta.db_table)
+    user, ingredient, total = (
+        quote(CartIngredient._meta.get_field(field).column)
+        for field in ('user', 'ingredient', 'total'))
+    with connection.cursor() as cursor:
+        # WHERE true снимает неоднозначность ON в SQLite после SELECT.
+        cursor.execute(
+            f'INSERT INTO {table} ({user}, {ingredient}, {total}) '
+            f'SELECT * FROM ({rows_sql}) increments WHERE true '
+            f'ON CONFLICT ({user}, {ingredient}) DO UPDATE SET '
+            f'{total} = {table}.{total} + EXCLUDED.{total}',
+            params)
+
+
+def decrement_rows(rows, decrements):
+    rows = rows.filter(ingredient_id__in=decrements)
+    rows.update(total=Greatest(F('total') + Case(
+        *[When(ingredient_id=ingredient_id, then=Value(delta))
+          for ingredient_id, delta in decrements.items()],
+        default=Value(0)), Value(0)))
+    rows.filter(total=0).delete()
+
+
+def add_recipes(user_id, recipe_ids):
+    sql, params = RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids).values('ingredient_id').annotate(
+        added=Sum('amount')).order_by().query.sql_with_params()
+    increment_rows(
+        f'SELECT %s, amounts.ingredient_id, amounts.added '
+        f'FROM ({sql}) amounts', (user_id, *params))
+
+
+def subtract_recipes(user_id, recipe_ids):
+    # Одним UPDATE с подзапросом, без предварительного чтения состава.
+    amounts = RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+    rows = CartIngredient.objects.filter(
+        user_id=user_id, ingredient_id__in=amounts.values('ingredient_id'))
+    rows.update(total=Greatest(F('total') - Subquery(
+        amounts.filter(ingredient_id=OuterRef('ingredient_id')).order_by()
+        .values('ingredient_id').annotate(removed=Sum('amount'))
+        .values('removed')), Value(0)))
+    rows.filter(total=0).delete()
+
+
+@transaction.atomic(savepoint=False)
+def change_cart_summary(user_id, recipe_ids, sign=1):
+    if sign < 0:
+        subtract_recipes(user_id, recipe_ids)
+    else:
+        add_recipes(user_id, recipe_ids)
+
+
+def recipe_amounts(recipe_id):
+    return dict(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id).values_list('ingredient_id', 'amount'))
+
+
+@transaction.atomic(savepoint=False)
+def update_recipe_in_carts(recipe_id, old_amounts, amounts=None):
+    # old_amounts и amounts - состав рецепта до и после правки:
+    # {ingredient_id: amount}. Если новый состав не передан, он читается.
+    # Владельцы корзин выбираются подзапросом в той же записи.
+    if amounts is None:
+        amounts = recipe_amounts(recipe_id)
+    deltas = {ingredient_id: (amounts.get(ingredient_id, 0)
+                              - old_amounts.get(ingredient_id, 0))
+              for ingredient_id in amounts.keys() | old_amounts.keys()}
+    increments = [(ingredient_id, delta)
+                  for ingredient_id, delta in deltas.items() if delta > 0]
+    decrements = {ingredient_id: delta
+                  for ingredient_id, delta in deltas.items() if delta < 0}
+    users = Cart.objects.filter(recipe_id=recipe_id).values('user_id')
+    if increments:
+        sql, params = users.order_by().query.sql_with_params()
+        increment_rows(
+            f'SELECT users.user_id, deltas.column1, deltas.column2 '
+            f'FROM ({sql}) users CROSS JOIN (VALUES '
+            + ', '.join(['(%s, %s)'] * len(increments)) + ') deltas',
+            (*params, *(value for row in increments for value in row)))
+    if decrements:
+        decrement_rows(CartIngredient.objects.filter(user_id__in=users),
+                       decrements)
+
+
+@contextmanager
+def recipes_changing(recipe_ids):
+    # Для правок состава рецептов по одному ингредиенту (админка).
+    with transaction.atomic(savepoint=False):
+        old_amounts = {recipe_id: recipe_amounts(recipe_id)
+                       for recipe_id in set(recipe_ids) if recipe_id}
+        yield
+        for recipe_id, amounts in old_amounts.items():
+            update_recipe_in_carts(recipe_id, amounts)
+
+
+@transaction.atomic(savepoint=False)
+def rebuild_cart_summaries(user_ids):
+    # Полный пересчет для данных, записанных в обход сигналов.
+    CartIngredient.objects.filter(user_id__in=user_ids).delete()
+    CartIngredient.objects.bulk_create([
+        CartIngredient(user_id=user_id, ingredient_id=ingredient_id,
+                       total=total)
+        for user_id, ingredient_id, total in RecipeIngredient.objects.filter(
+            recipe__carts__user_id__in=user_ids
+        ).values_list('recipe__carts__user_id', 'ingredient_id').annotate(
+            total=Sum('amount')).order_by()
+    ], batch_size=settings.LOAD_BATCH_SIZE)
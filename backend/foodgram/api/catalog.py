@@ -0,0 +1,117 @@
+import time
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.request import Request
+
+from recipes.models import Tag
+
+CATALOG_VERSION_KEY = 'catalog_version'
+TAG_IDS_KEY = 'tag_ids:{version}'
+
+
+def bump_catalog_version():
+    version = max(time.time_ns() // 1000,
+                  cache.get(CATALOG_VERSION_KEY, 0) + 1)
+    cache.set(CATALOG_VERSION_KEY, version, None)
+    return version
+
+
+def schedule_catalog_bump():
+    # Версия меняется только после коммита: иначе параллельный GET успеет
+    # собрать старые строки под новой версией, и они останутся в кэше на
+    # CATALOG_CACHE_TIMEOUT, а индекс ингредиентов - на старых данных.
+    transaction.on_commit(bump_catalog_version)
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        return bump_catalog_version()
+    return version
+
+
+def get_tag_ids():
+    key = TAG_IDS_KEY.format(version=get_catalog_version())
+    tag_ids = cache.get(key)
+    if tag_ids is None:
+        tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, tag_ids, settings.CATALOG_CACHE_TIMEOUT)
+    return tag_ids
+
+
+class CatalogCacheMixin:
+    # Теги и ингредиенты меняются только через админку, поэтому GET-ответы
+    # хранятся в кэше готовыми байтами под текущей версией справочников.
+    # Справочники публичные: токен не проверяется, чтобы ответ из кэша и
+    # 304 не требовали обращения к БД.
+    authentication_classes = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return super().dispatch(request, *args, **kwargs)
+        version = get_catalog_version()
+        etag = quote_etag(f'catalog-{version}')
+        last_modified = version // 1_000_000
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            # Ответ зависит от Accept (JSON или browsable API), а ETag у
+            # вариантов общий.
+            patch_vary_headers(response, ('Accept',))
+            return response
+        key = self.get_cache_key(request, version, kwargs)
+        cached = cache.get(key) if key else None
+        if cached is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if key and self.should_cache(request, response):
+                response.render()
+                cache.set(key, (response.content, response['Content-Type']),
+                          settings.CATALOG_CACHE_TIMEOUT)
+        else:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+    def get_cache_variant(self, request, kwargs):
+        # Ключ кэша не строится из сырой строки запроса: иначе любой клиент
+        # заводит новые записи на сутки, меняя параметры. Кэшируется только
+        # список без параметров.
+        if kwargs or request.GET:
+            return None
+        return ''
+
+    def should_cache(self, request, response):
+        return True
+
+    def get_cache_key(self, request, version, kwargs):
+        variant = self.get_cache_variant(request, kwargs)
+        if variant is None:
+            return None
+        try:
+            renderer, _ = self.get_content_negotiator().select_renderer(
+                Request(request), self.get_renderers())
+        except NotAcceptable:
+            return None
+        return 'catalog:{}:{}:{}:{}'.format(
+            version, request.path, renderer.format,
+            md5(variant.encode()).hexdigest())
+
+    def use_replica(self, request):
+        # Ответ кэшируется на сутки под новой версией справочников, поэтому
+        # сразу после правки в админке его нельзя собирать с отстающей
+        # реплики. Версия - время изменения в микросекундах.
+        return (super().use_replica(request)
+                and time.time() - get_catalog_version() / 1_000_000
+                > settings.REPLICA_PIN_SECONDS)
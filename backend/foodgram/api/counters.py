@@ -0,0 +1,9 @@
+from django.db.models import F
+
+
+def change_counter(queryset, field, delta):
+    # Денормализованные счетчики меняются одним UPDATE и не уходят ниже
+    # нуля, даже если счетчик уже разошелся с данными.
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gt': 0})
+    queryset.update(**{field: F(field) + delta})
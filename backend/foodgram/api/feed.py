@@ -0,0 +1,121 @@
+from heapq import merge
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from recipes.models import FeedEntry, Recipe, Subscription
+from users.models import User
+
+# Новый рецепт раскладывается по лентам подписчиков (fan-out on write).
+# У популярных и очень плодовитых авторов это слишком дорого, поэтому они
+# помечаются feed_on_read, и их рецепты подмешиваются в ленту при чтении.
+
+
+def feed_on_read(author):
+    if author.feed_on_read:
+        return True
+    subscribers = getattr(author, 'subscribers_count', None)
+    if subscribers is None and (
+            author.recipes_count <= settings.FEED_PUSH_MAX_RECIPES):
+        subscribers = Subscription.objects.filter(
+            author_id=author.pk).count()
+    if (author.recipes_count > settings.FEED_PUSH_MAX_RECIPES
+            or subscribers > settings.FEED_PUSH_MAX_SUBSCRIBERS):
+        User.objects.filter(pk=author.pk).update(feed_on_read=True)
+        return True
+    return False
+
+
+def load_author(author_id):
+    return User.objects.only('feed_on_read', 'recipes_count').get(
+        pk=author_id)
+
+
+def save_entries(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=settings.LOAD_BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out_recipe(recipe_id, author_id, pub_date):
+    if feed_on_read(load_author(author_id)):
+        return
+    save_entries([
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+        for user_id in Subscription.objects.filter(
+            author_id=author_id).values_list('subscriber_id', flat=True)
+    ])
+
+
+def schedule_fan_out(recipe):
+    transaction.on_commit(lambda: fan_out_recipe(
+        recipe.pk, recipe.author_id, recipe.pub_date))
+
+
+def backfill_timeline(user_id, author_id):
+    if feed_on_read(load_author(author_id)):
+        return
+    save_entries([
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+        for recipe_id, pub_date in Recipe.custom_objects.filter(
+            author_id=author_id).values_list('id', 'pub_date')
+    ])
+
+
+def backfill_timelines(user_id, author_ids):
+    # Для пачки новых подписок: авторы с числом подписчиков загружаются
+    # одним запросом, рецепты всех авторов - другим.
+    authors = User.objects.filter(pk__in=author_ids).annotate(
+        subscribers_count=Count('following')).only(
+        'feed_on_read', 'recipes_count')
+    push_ids = [author.pk for author in authors
+                if not feed_on_read(author)]
+    if not push_ids:
+        return
+    save_entries([
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+        for recipe_id, pub_date in Recipe.custom_objects.filter(
+            author_id__in=push_ids).values_list('id', 'pub_date')
+    ])
+
+
+def drop_from_timeline(user_id, author_id):
+    drop_from_timelines(user_id, [author_id])
+
+
+def drop_from_timelines(user_id, author_ids):
+    FeedEntry.objects.filter(user_id=user_id,
+                             recipe__author_id__in=author_ids).delete()
+
+
+def before_key(queryset, before, pk):
+    if before is None:
+        return queryset
+    pub_date, last_pk = before
+    return queryset.filter(Q(pub_date__lt=pub_date)
+                           | Q(pub_date=pub_date, **{f'{pk}__lt': last_pk}))
+
+
+def get_feed_keys(user_id, before, size):
+    # Каждый поток - короткий запрос по индексу с LIMIT, поэтому страница
+    # не дорожает с ростом числа подписок.
+    streams = [before_key(
+        FeedEntry.objects.filter(user_id=user_id), before, 'recipe_id'
+    ).order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id')[:size]]
+    for author_id in Subscription.objects.filter(
+            subscriber_id=user_id, author__feed_on_read=True).values_list(
+            'author_id', flat=True):
+        streams.append(before_key(
+            Recipe.custom_objects.filter(author_id=author_id), before, 'id'
+        ).order_by('-pub_date', '-id').values_list('pub_date', 'id')[:size])
+    keys = []
+    seen = set()
+    for pub_date, pk in merge(*streams, reverse=True):
+        if pk in seen:
+            continue
+        seen.add(pk)
+        keys.append((pub_date, pk))
+        if len(keys) == size:
+            break
+    return keys
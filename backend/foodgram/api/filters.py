@@ -1,17 +1,40 @@
-from django_filters import AllValuesMultipleFilter, CharFilter, FilterSet
+from django.db.models import Exists, OuterRef
+from django_filters import CharFilter, FilterSet, MultipleChoiceFilter
 
+from api.catalog import get_tag_ids
+from api.search import search_recipes
 from recipes.models import Recipe
 
 
+def tag_slug_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
+
+
 class RecipeFilter(FilterSet):
-    tags = AllValuesMultipleFilter(field_name='tags__slug')
+    tags = MultipleChoiceFilter(choices=tag_slug_choices,
+                                method='filter_tags')
     is_favorited = CharFilter(method='filter_is_favorited__in')
     is_in_shopping_cart = CharFilter(method='filter_is_in_shopping_cart__in')
+    search = CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
         fields = ('author', 'tags', 'is_favorited',)
 
+    def filter_tags(self, queryset, name, value):
+        tag_ids = get_tag_ids()
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk'),
+                tag_id__in=[tag_ids[slug] for slug in value]
+            )
+        ))
+
+    def filter_search(self, queryset, name, value):
+        if value.strip():
+            return search_recipes(queryset, value.strip())
+        return queryset
+
     def filter_is_favorited__in(self, queryset, name, value):
         if value:
             return queryset.filter(favorites__user=self.request.user)
@@ -0,0 +1,111 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from recipes.models import Recipe
+
+RENDITIONS_DIR = 'recipes/renditions/'
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+
+logger = logging.getLogger(__name__)
+
+executor = (ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS,
+                               thread_name_prefix='renditions')
+            if settings.IMAGE_WORKERS else None)
+
+
+def needs_renditions(recipe):
+    return bool(recipe.image) and (
+        recipe.image_renditions.get('source') != recipe.image.name)
+
+
+def schedule_renditions(recipe_id):
+    if executor is None:
+        transaction.on_commit(lambda: make_renditions(recipe_id))
+    else:
+        transaction.on_commit(lambda: submit_renditions(recipe_id))
+
+
+def schedule_renditions_cleanup(renditions):
+    # Файлы удаляются только после коммита: при откате удаления рецепт
+    # остается со своими превью.
+    if renditions:
+        transaction.on_commit(lambda: delete_renditions(renditions))
+
+
+def submit_renditions(recipe_id):
+    executor.submit(run_in_worker, recipe_id).add_done_callback(
+        partial(report_failure, recipe_id))
+
+
+def report_failure(recipe_id, future):
+    # Ошибка в потоке иначе пропадет вместе с future; рецепт при этом
+    # продолжает отдавать исходную картинку.
+    error = future.exception()
+    if error is not None:
+        logger.error('Не удалось создать превью рецепта %s', recipe_id,
+                     exc_info=error)
+
+
+def run_in_worker(recipe_id):
+    try:
+        make_renditions(recipe_id)
+    finally:
+        connections.close_all()
+
+
+def make_renditions(recipe_id):
+    recipe = Recipe.custom_objects.only(
+        'image', 'image_renditions').filter(pk=recipe_id).first()
+    if recipe is None or not needs_renditions(recipe):
+        return
+    with recipe.image.open('rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    stem = PurePosixPath(recipe.image.name).stem
+    renditions = {'source': recipe.image.name}
+    for name, (size, image_format) in settings.RECIPE_IMAGE_RENDITIONS.items():
+        rendition = image.copy()
+        rendition.thumbnail(size, Image.LANCZOS)
+        if image_format == 'JPEG' and rendition.mode != 'RGB':
+            rendition = rendition.convert('RGB')
+        buffer = BytesIO()
+        rendition.save(buffer, image_format,
+                       quality=settings.IMAGE_RENDITION_QUALITY)
+        renditions[name] = default_storage.save(
+            f'{RENDITIONS_DIR}{stem}_{name}.{EXTENSIONS[image_format]}',
+            ContentFile(buffer.getvalue())
+        )
+    updated = Recipe.custom_objects.filter(
+        pk=recipe_id, image=recipe.image.name
+    ).update(image_renditions=renditions)
+    delete_renditions(recipe.image_renditions if updated else renditions)
+
+
+def delete_renditions(renditions):
+    for name, path in renditions.items():
+        if name != 'source':
+            default_storage.delete(path)
+
+
+def rendition_urls(recipe, request=None):
+    if not recipe.image:
+        return {}
+    # Превью от прежней картинки не отдаются, пока не готовы новые.
+    renditions = (recipe.image_renditions
+                  if recipe.image_renditions.get('source') == recipe.image.name
+                  else {})
+    urls = {}
+    for name in settings.RECIPE_IMAGE_RENDITIONS:
+        path = renditions.get(name)
+        url = default_storage.url(path) if path else recipe.image.url
+        urls[name] = request.build_absolute_uri(url) if request else url
+    return urls
@@ -0,0 +1,86 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from threading import Lock
+
+from api.catalog import get_catalog_version
+from recipes.models import Ingredient
+
+SEPARATOR = '\x00'
+NGRAM = 3
+
+
+def normalize(value):
+    return value.casefold().replace('ё', 'е').replace(SEPARATOR, '').strip()
+
+
+def ngrams(value):
+    return {value[i:i + NGRAM] for i in range(len(value) - NGRAM + 1)}
+
+
+class IngredientIndex:
+    # Отсортированные нормализованные названия ингредиентов в памяти процесса.
+    # Префиксы ищутся бинарным поиском, вхождения — по триграммам, а для
+    # коротких запросов — str.find по склейке всех названий. Индекс
+    # перестраивается, когда меняется версия справочников.
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._data = ((), (), '', (), {})
+
+    def build(self, version=None):
+        rows = sorted(
+            ((normalize(row['name']), row) for row in
+             Ingredient.objects.values('id', 'name', 'measurement_unit')),
+            key=lambda item: (item[0], item[1]['id'])
+        )
+        keys = tuple(key for key, _ in rows)
+        offsets = array('L')
+        postings = defaultdict(lambda: array('L'))
+        position = 0
+        for index, key in enumerate(keys):
+            offsets.append(position)
+            position += len(key) + len(SEPARATOR)
+            for ngram in ngrams(key):
+                postings[ngram].append(index)
+        self._data = (keys, tuple(row for _, row in rows),
+                      SEPARATOR.join(keys), offsets, dict(postings))
+        self._version = version
+
+    def _ensure_built(self):
+        version = get_catalog_version()
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version != version:
+                self.build(version)
+
+    def _find_substrings(self, term):
+        keys, _, haystack, offsets, postings = self._data
+        if len(term) >= NGRAM:
+            candidates = min(
+                (postings.get(ngram, ()) for ngram in ngrams(term)), key=len)
+            return [index for index in candidates if term in keys[index]]
+        found = []
+        position = haystack.find(term)
+        while position != -1:
+            index = bisect_right(offsets, position) - 1
+            found.append(index)
+            if index + 1 == len(offsets):
+                break
+            position = haystack.find(term, offsets[index + 1])
+        return found
+
+    def search(self, term):
+        self._ensure_built()
+        keys, rows = self._data[:2]
+        term = normalize(term)
+        start = bisect_left(keys, term)
+        end = bisect_left(keys, term + '\U0010ffff', start)
+        found = list(range(start, end))
+        found.extend(index for index in self._find_substrings(term)
+                     if not start <= index < end)
+        return [rows[index] for index in found]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.models import Subscription
+
+MEMBERSHIP_KEY = 'recipe_ids:{model}:{user_id}'
+FOLLOWING_KEY = 'author_ids:{user_id}'
+
+
+def membership_key(model, user_id):
+    return MEMBERSHIP_KEY.format(model=model._meta.model_name,
+                                 user_id=user_id)
+
+
+def get_recipe_ids(model, user_id):
+    key = membership_key(model, user_id)
+    recipe_ids = cache.get(key)
+    if recipe_ids is None:
+        recipe_ids = frozenset(model.objects.filter(
+            user_id=user_id).values_list('recipe_id', flat=True))
+        cache.set(key, recipe_ids, settings.MEMBERSHIP_CACHE_TIMEOUT)
+    return recipe_ids
+
+
+def invalidate_recipe_ids(model, user_id):
+    cache.delete(membership_key(model, user_id))
+
+
+def get_author_ids(user_id):
+    key = FOLLOWING_KEY.format(user_id=user_id)
+    author_ids = cache.get(key)
+    if author_ids is None:
+        author_ids = frozenset(Subscription.objects.filter(
+            subscriber_id=user_id).values_list('author_id', flat=True))
+        cache.set(key, author_ids, settings.MEMBERSHIP_CACHE_TIMEOUT)
+    return author_ids
+
+
+def invalidate_author_ids(user_id):
+    cache.delete(FOLLOWING_KEY.format(user_id=user_id))
@@ -0,0 +1,188 @@
+import logging
+import os
+import traceback
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Статистика текущего запроса. Контекстная переменная доходит и до потоков
+# пула асинхронных представлений, поэтому их запросы к БД тоже учитываются.
+current_stats = ContextVar('current_stats', default=None)
+INSTRUMENTATION_FILES = (__file__, os.path.join(os.path.dirname(__file__),
+                                                'middleware.py'))
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n')
+
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.series = {}
+        self.lock = Lock()
+
+    def inc(self, values, amount=1):
+        with self.lock:
+            self.series[values] = self.series.get(values, 0) + amount
+
+    def snapshot(self, value):
+        return value
+
+    def samples(self, values, value):
+        yield f'{self.name}{format_labels(self.labels, values)} {value}'
+
+    def render(self):
+        with self.lock:
+            series = [(values, self.snapshot(value))
+                      for values, value in sorted(self.series.items())]
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} {self.kind}']
+        for values, value in series:
+            lines.extend(self.samples(values, value))
+        return lines
+
+
+class Histogram(Counter):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels, buckets):
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+
+    def observe(self, values, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(values)
+            if series is None:
+                series = self.series[values] = [
+                    [0] * (len(self.buckets) + 1), 0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self, values, value):
+        counts, total = value
+        cumulative = 0
+        for bucket, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            labels = format_labels(self.labels, values, f'le="{bucket}"')
+            yield f'{self.name}_bucket{labels} {cumulative}'
+        labels = format_labels(self.labels, values)
+        yield f'{self.name}_sum{labels} {total}'
+        yield f'{self.name}_count{labels} {cumulative}'
+
+    def snapshot(self, value):
+        counts, total = value
+        return list(counts), total
+
+
+REQUEST_DURATION = Histogram(
+    'foodgram_request_duration_seconds', 'Время обработки запроса.',
+    ('view', 'method'), LATENCY_BUCKETS)
+REQUEST_QUERIES = Histogram(
+    'foodgram_request_queries', 'Количество SQL-запросов за запрос.',
+    ('view', 'method'), QUERY_BUCKETS)
+REQUEST_SQL_DURATION = Histogram(
+    'foodgram_request_sql_duration_seconds', 'Время SQL-запросов за запрос.',
+    ('view', 'method'), LATENCY_BUCKETS)
+SLOW_QUERIES = Counter(
+    'foodgram_slow_queries_total', 'Количество медленных SQL-запросов.',
+    ('view',))
+METRICS = (REQUEST_DURATION, REQUEST_QUERIES, REQUEST_SQL_DURATION,
+           SLOW_QUERIES)
+
+
+class RequestStats:
+    def __init__(self, path):
+        self.path = path
+        self.queries = 0
+        self.sql_duration = 0.0
+        self.slow_queries = 0
+
+
+def call_site():
+    # Ближайший кадр кода проекта, а если запрос пришел из библиотеки
+    # (например, аутентификации DRF) - ближайший кадр вне ORM.
+    base_dir = str(settings.BASE_DIR)
+    library_frame = None
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if (frame.filename in INSTRUMENTATION_FILES
+                or f'{os.sep}django{os.sep}db{os.sep}' in frame.filename):
+            continue
+        if (frame.filename.startswith(base_dir)
+                and 'site-packages' not in frame.filename):
+            return (f'{os.path.relpath(frame.filename, base_dir)}:'
+                    f'{frame.lineno} in {frame.name}')
+        if library_frame is None:
+            library_frame = frame
+    if library_frame is None:
+        return 'unknown'
+    return (f'{library_frame.filename}:{library_frame.lineno} '
+            f'in {library_frame.name}')
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = perf_counter() - start
+        stats.queries += 1
+        stats.sql_duration += duration
+        if duration * 1000 >= settings.SLOW_QUERY_MS:
+            stats.slow_queries += 1
+            logger.warning('Медленный запрос %.1f мс (%s, %s): %s',
+                           duration * 1000, stats.path, call_site(), sql)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def observe_request(view, method, duration, stats):
+    labels = (view, method)
+    REQUEST_DURATION.observe(labels, duration)
+    REQUEST_QUERIES.observe(labels, stats.queries)
+    REQUEST_SQL_DURATION.observe(labels, stats.sql_duration)
+    if stats.slow_queries:
+        SLOW_QUERIES.inc((view,), stats.slow_queries)
+
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    if (settings.METRICS_TOKEN and request.headers.get('Authorization')
+            != f'Bearer {settings.METRICS_TOKEN}'):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
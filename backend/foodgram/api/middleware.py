@@ -0,0 +1,66 @@
+import asyncio
+from time import perf_counter
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+
+from api.metrics import RequestStats, current_stats, observe_request
+from api.replicas import pin_to_primary
+
+
+class InstrumentationMiddleware:
+    # Работает и в синхронном, и в асинхронном режиме, чтобы под ASGI
+    # не переводить весь стек middleware в поток-адаптер.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = RequestStats(request.path)
+        token = current_stats.set(stats)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats, perf_counter() - start)
+
+    async def __acall__(self, request):
+        stats = RequestStats(request.path)
+        token = current_stats.set(stats)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats, perf_counter() - start)
+
+    def finish(self, request, response, stats, duration):
+        match = request.resolver_match
+        observe_request(match.view_name if match else 'unresolved',
+                        request.method, duration, stats)
+        response['Server-Timing'] = (
+            f'app;dur={duration * 1000:.1f}, '
+            f'db;dur={stats.sql_duration * 1000:.1f};'
+            f'desc="{stats.queries} queries"')
+        return response
+
+
+class ReplicaPinMiddleware(MiddlewareMixin):
+    # Успешная запись закрепляет пользователя за основной БД. Пользователя
+    # в запрос кладет аутентификация DRF, поэтому проверка идет по ответу.
+    def process_response(self, request, response):
+        user = getattr(request, 'user', None)
+        if (settings.REPLICA_DATABASES
+                and request.method not in SAFE_METHODS
+                and response.status_code < 400
+                and user is not None and user.is_authenticated):
+            pin_to_primary(user.id)
+        return response
@@ -0,0 +1,86 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from api.feed import get_feed_keys
+
+
+class RecipePagination(PageNumberPagination):
+    # С параметром ?cursor= лента листается по ключу (pub_date, id):
+    # без COUNT(*) и OFFSET, поэтому дальние страницы не медленнее первой.
+    page_size_query_param = 'limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('pub_date', 'id')
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            pub_date, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, id__gt=pk))
+        page = list(queryset[:page_size + 1])
+        self.next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self.encode_cursor(page[-1].pub_date,
+                                                  page[-1].id)
+        return page
+
+    def paginate_feed(self, request, user_id):
+        # Лента идет от новых рецептов к старым, курсор - ключ последнего.
+        self.cursor_mode = True
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        keys = get_feed_keys(
+            user_id, self.decode_cursor(cursor) if cursor else None,
+            page_size + 1)
+        self.next_cursor = None
+        if len(keys) > page_size:
+            keys = keys[:page_size]
+            self.next_cursor = self.encode_cursor(*keys[-1])
+        return [pk for _, pk in keys]
+
+    def encode_cursor(self, pub_date, pk):
+        return urlsafe_b64encode(
+            f'{pub_date.isoformat()}|{pk}'.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            pub_date, pk = urlsafe_b64decode(
+                cursor.encode()).decode().rsplit('|', 1)
+            pub_date = parse_datetime(pub_date)
+            if pub_date is None:
+                raise ValueError
+            return pub_date, int(pk)
+        except ValueError:
+            raise NotFound(settings.INVALID_CURSOR)
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(),
+                                   self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
@@ -0,0 +1,57 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY = 'db_pin:{user_id}'
+
+# Алиас реплики, с которой читает текущий запрос; None - основная БД.
+replica_alias = ContextVar('replica_alias', default=None)
+
+
+def pin_to_primary(user_id):
+    # После записи пользователь какое-то время читает с основной БД,
+    # чтобы сразу видеть свои изменения, пока реплики догоняют.
+    cache.set(PIN_KEY.format(user_id=user_id), True,
+              settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return (user_id is not None
+            and cache.get(PIN_KEY.format(user_id=user_id)) is not None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return replica_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная БД.
+        return True
+
+
+class ReplicaReadMixin:
+    # Безопасные запросы читают с реплики. Переключение происходит после
+    # аутентификации: токен, только что выданный при входе, мог ещё не
+    # доехать до реплики.
+    def use_replica(self, request):
+        return (bool(settings.REPLICA_DATABASES)
+                and request.method in SAFE_METHODS
+                and not is_pinned(request.user.id))
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.use_replica(request):
+            replica_alias.set(random.choice(settings.REPLICA_DATABASES))
+
+    def dispatch(self, request, *args, **kwargs):
+        token = replica_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            replica_alias.reset(token)
@@ -0,0 +1,110 @@
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+# На PostgreSQL у recipes_recipe есть колонка search_vector (tsvector) с
+# GIN-индексом, на SQLite - FTS5-таблица recipes_recipe_fts с rowid рецепта.
+# Обе создаются миграцией recipes.0006 вне модели, поэтому здесь сырой SQL.
+FTS_TABLE = 'recipes_recipe_fts'
+WORD = re.compile(r'\w+')
+
+RECIPES = Recipe._meta.db_table
+INGREDIENTS = Ingredient._meta.db_table
+RECIPE_INGREDIENTS = RecipeIngredient._meta.db_table
+
+AGGREGATES = {
+    'postgresql': "string_agg(i.name, ' ')",
+    'sqlite': "group_concat(i.name, ' ')",
+}
+
+
+def ingredient_names(vendor):
+    return (f'COALESCE((SELECT {AGGREGATES[vendor]} '
+            f'FROM {RECIPE_INGREDIENTS} ri JOIN {INGREDIENTS} i '
+            f"ON i.id = ri.ingredient_id WHERE ri.recipe_id = r.id), '')")
+
+
+def fts_query(query):
+    # Слова пользователя берутся в кавычки, чтобы символы синтаксиса FTS5
+    # не ломали запрос, и ищутся по префиксу: стемминга в unicode61 нет.
+    return ' '.join(f'"{word}"*' for word in WORD.findall(query))
+
+
+def search_recipes(queryset, query):
+    if connection.vendor == 'postgresql':
+        tsquery = 'websearch_to_tsquery(%s, %s)'
+        params = (settings.SEARCH_CONFIG, query)
+        return queryset.filter(RawSQL(
+            f'{RECIPES}.search_vector @@ {tsquery}', params,
+            output_field=BooleanField()
+        )).annotate(search_rank=RawSQL(
+            f'ts_rank({RECIPES}.search_vector, {tsquery})', params,
+            output_field=FloatField()
+        )).order_by('-search_rank', '-pub_date', '-id')
+    if connection.vendor == 'sqlite':
+        match = fts_query(query)
+        if not match:
+            return queryset.none()
+        # FTS5-таблица присоединяется к рецептам, и MATCH с bm25 выполняется
+        # один раз на запрос, а не коррелированным подзапросом на каждую
+        # строку. bm25 тем меньше, чем лучше совпадение; веса - name,
+        # ingredients, text.
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {RECIPES}.id',
+                   f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'bm25({FTS_TABLE}, 10.0, 5.0, 1.0)'},
+        ).order_by('search_rank', '-pub_date', '-id')
+    return queryset.filter(name__icontains=query)
+
+
+def batches(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), settings.LOAD_BATCH_SIZE):
+        yield recipe_ids[start:start + settings.LOAD_BATCH_SIZE]
+
+
+def update_search_index(recipe_ids):
+    if connection.vendor not in AGGREGATES:
+        return
+    with connection.cursor() as cursor:
+        for batch in batches(recipe_ids):
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    f'UPDATE {RECIPES} AS r SET search_vector = '
+                    f"setweight(to_tsvector(%s, r.name), 'A') || "
+                    f'setweight(to_tsvector('
+                    f"%s, {ingredient_names('postgresql')}), 'B') || "
+                    f"setweight(to_tsvector(%s, r.text), 'C') "
+                    f'WHERE r.id = ANY(%s)',
+                    [settings.SEARCH_CONFIG] * 3 + [batch])
+                continue
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                batch)
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+                f"SELECT r.id, r.name, {ingredient_names('sqlite')}, r.text "
+                f'FROM {RECIPES} r WHERE r.id IN ({placeholders})', batch)
+
+
+def remove_from_search_index(recipe_ids):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for batch in batches(recipe_ids):
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                batch)
+
+
+def schedule_search_update(recipe_ids):
+    transaction.on_commit(lambda: update_search_index(recipe_ids))
@@ -4,11 +4,16 @@ from djoser.serializers import UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
-from api.utils import check_ingredients
+from api.carts import update_recipe_in_carts
+from api.images import rendition_urls
+from api.utils import (attach_author_recipes, check_ingredients, check_tags,
+                       get_recipes_limit)
 from recipes.models import (Cart, Favorite, Ingredient, Recipe,
                             RecipeIngredient, Subscription, Tag)
 from users.models import User
 
+NOT_POSITIVE_TAG_ID = settings.NOT_POSITIVE_INTEGER_TAG.format(tag='id тега')
+
 
 class CustomUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
@@ -20,9 +25,14 @@ class CustomUserSerializer(UserSerializer):
         read_only_fields = ('is_subscribed',)
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        author_ids = self.context.get('author_ids')
+        if author_ids is not None:
+            return obj.id in author_ids
         request = self.context.get('request')
-        if request:
-            return obj.subscriber.filter(subscriber=request.user.id).exists()
+        if request and request.user.is_authenticated:
+            return obj.following.filter(subscriber=request.user.id).exists()
         return False
 
 
@@ -51,9 +61,17 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount',)
 
 
-class RecipeSerializerRead(serializers.ModelSerializer):
-    is_favorited = serializers.BooleanField(default=False)
-    is_in_shopping_cart = serializers.BooleanField(default=False)
+class RecipeImageRenditionsMixin(serializers.Serializer):
+    image_renditions = serializers.SerializerMethodField()
+
+    def get_image_renditions(self, obj):
+        return rendition_urls(obj, self.context.get('request'))
+
+
+class RecipeSerializerRead(RecipeImageRenditionsMixin,
+                           serializers.ModelSerializer):
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
     tags = TagSerializer(many=True, )
     author = CustomUserSerializer()
     ingredients = RecipeIngredientSerializer(many=True, read_only=True,
@@ -62,12 +80,25 @@ class RecipeSerializerRead(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
-                  'is_in_shopping_cart', 'name', 'image', 'text',
-                  'cooking_time')
+                  'is_in_shopping_cart', 'name', 'image', 'image_renditions',
+                  'text', 'cooking_time')
         read_only_fields = ('id', 'author',)
 
+    def get_is_favorited(self, obj):
+        return obj.id in self.context.get('favorite_ids', ())
+
+    def get_is_in_shopping_cart(self, obj):
+        return obj.id in self.context.get('cart_ids', ())
+
 
 class RecipeSerializerWrite(serializers.ModelSerializer):
+    tags = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, error_messages={
+            'invalid': NOT_POSITIVE_TAG_ID,
+            'min_value': NOT_POSITIVE_TAG_ID,
+        }),
+        allow_empty=False
+    )
     image = Base64ImageField()
     cooking_time = serializers.IntegerField(min_value=settings.MINVALUE,
                                             max_value=settings.MAXVALUE)
@@ -80,6 +111,9 @@ class RecipeSerializerWrite(serializers.ModelSerializer):
     def to_representation(self, obj):
         return RecipeSerializerRead(obj).data
 
+    def validate_tags(self, tags):
+        return check_tags(tags)
+
     def validate_ingredients(self):
         if 'ingredients' not in self.initial_data:
             raise serializers.ValidationError(
@@ -89,7 +123,8 @@ class RecipeSerializerWrite(serializers.ModelSerializer):
         return all_ingredients
 
     def create_ingredients(self, ingredients, recipe):
-
+        if not ingredients:
+            return
         recipe_ingredients = [
             RecipeIngredient(
                 recipe=recipe,
@@ -100,6 +135,34 @@ class RecipeSerializerWrite(serializers.ModelSerializer):
         ]
         RecipeIngredient.objects.bulk_create(recipe_ingredients)
 
+    def update_ingredients(self, ingredients, recipe):
+        submitted = {int(ingredient['id']): int(ingredient['amount'])
+                     for ingredient in ingredients}
+        stored = {recipe_ingredient.ingredient_id: recipe_ingredient
+                  for recipe_ingredient in recipe.recipeingredients.all()}
+        old_amounts = {ingredient_id: recipe_ingredient.amount
+                       for ingredient_id, recipe_ingredient in stored.items()}
+        to_delete = [recipe_ingredient.pk
+                     for ingredient_id, recipe_ingredient in stored.items()
+                     if ingredient_id not in submitted]
+        to_update = []
+        for ingredient_id, recipe_ingredient in stored.items():
+            amount = submitted.get(ingredient_id)
+            if amount is not None and recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                to_update.append(recipe_ingredient)
+        if to_delete:
+            RecipeIngredient.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+        self.create_ingredients(
+            [{'id': ingredient_id, 'amount': amount}
+             for ingredient_id, amount in submitted.items()
+             if ingredient_id not in stored],
+            recipe
+        )
+        update_recipe_in_carts(recipe.pk, old_amounts, submitted)
+
     @transaction.atomic
     def create(self, validated_data):
         ingredients = self.validate_ingredients()
@@ -118,15 +181,14 @@ class RecipeSerializerWrite(serializers.ModelSerializer):
         ingredients = self.validate_ingredients()
         tags = validated_data.pop('tags')
         instance.tags.set(tags)
-        RecipeIngredient.objects.filter(recipe=instance, ).delete()
-        self.create_ingredients(ingredients, instance)
+        self.update_ingredients(ingredients, instance)
         return super().update(instance, validated_data)
 
 
-class ShortRecipe(serializers.ModelSerializer):
+class ShortRecipe(RecipeImageRenditionsMixin, serializers.ModelSerializer):
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_renditions', 'cooking_time')
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -161,8 +223,10 @@ class SubscribeSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def to_representation(self, obj):
+        request = self.context.get('request')
+        attach_author_recipes([obj.author], get_recipes_limit(request))
         return SubscriptionSerializer(obj.author, context={
-            'request': self.context.get('request')}).data
+            'request': request}).data
 
     def validate(self, attrs):
         author = attrs['author']
@@ -183,7 +247,6 @@ class SubscribeSerializer(serializers.ModelSerializer):
 
 class SubscriptionSerializer(CustomUserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(CustomUserSerializer.Meta):
         fields = ('email', 'id', 'username', 'first_name',
@@ -193,10 +256,10 @@ class SubscriptionSerializer(CustomUserSerializer):
                             'recipes_count',)
 
     def get_recipes(self, obj):
-        recipes_limit = self.context.get('request').query_params.get(
-            'recipes_limit')
-        user_recipes = obj.recipes.all()
-        if recipes_limit:
-            user_recipes = user_recipes[:int(recipes_limit)]
+        if hasattr(obj, 'limited_recipes'):
+            user_recipes = obj.limited_recipes
+        else:
+            user_recipes = obj.recipes.all()[:get_recipes_limit(
+                self.context.get('request'))]
         return ShortRecipe(user_recipes, many=True, context={
             'request': self.context.get('request')}).data
@@ -0,0 +1,145 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import CACHED_FIELDS, schedule_token_invalidation
+from api.carts import change_cart_summary
+from api.counters import change_counter
+from api.catalog import schedule_catalog_bump
+from api.feed import backfill_timeline, drop_from_timeline, schedule_fan_out
+from api.images import (needs_renditions, schedule_renditions,
+                        schedule_renditions_cleanup)
+from api.memberships import invalidate_author_ids, invalidate_recipe_ids
+from api.search import remove_from_search_index, schedule_search_update
+from recipes.models import (Cart, Favorite, Ingredient, Recipe,
+                            RecipeIngredient, Subscription, Tag)
+from users.models import User
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_catalog(**kwargs):
+    schedule_catalog_bump()
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(instance, **kwargs):
+    # Выход через djoser, удаление токена в админке и удаление пользователя.
+    schedule_token_invalidation([instance.key])
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(instance, update_fields, **kwargs):
+    # Деактивация и смена прав; остальные поля пользователя в кэше не
+    # хранятся.
+    if update_fields and not set(update_fields) & set(CACHED_FIELDS):
+        return
+    schedule_token_invalidation(list(Token.objects.filter(
+        user_id=instance.pk).values_list('key', flat=True)))
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=Cart)
+def invalidate_memberships(sender, instance, **kwargs):
+    # После коммита: иначе параллельный GET успел бы снова закэшировать
+    # старый набор рецептов.
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_recipe_ids(sender, user_id))
+
+
+@receiver(post_save, sender=Cart)
+def add_to_cart_summary(instance, created, **kwargs):
+    if created:
+        change_cart_summary(instance.user_id, [instance.recipe_id])
+
+
+# pre_delete, а не post_delete: при удалении рецепта каскад может успеть
+# удалить его ингредиенты раньше, чем сработает сигнал корзины.
+@receiver(pre_delete, sender=Cart)
+def remove_from_cart_summary(instance, **kwargs):
+    change_cart_summary(instance.user_id, [instance.recipe_id], -1)
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def invalidate_following(instance, **kwargs):
+    subscriber_id = instance.subscriber_id
+    transaction.on_commit(lambda: invalidate_author_ids(subscriber_id))
+
+
+@receiver(post_save, sender=Recipe)
+def create_image_renditions(instance, **kwargs):
+    if needs_renditions(instance):
+        schedule_renditions(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_renditions(instance, **kwargs):
+    schedule_renditions_cleanup(instance.image_renditions)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(instance, **kwargs):
+    schedule_search_update([instance.pk])
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def index_recipe_ingredients(instance, **kwargs):
+    schedule_search_update([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def index_ingredient_recipes(instance, created, **kwargs):
+    if not created:
+        schedule_search_update(RecipeIngredient.objects.filter(
+            ingredient_id=instance.pk).values_list('recipe_id', flat=True))
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(instance, **kwargs):
+    remove_from_search_index([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+def publish_to_feeds(instance, created, **kwargs):
+    if created:
+        schedule_fan_out(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def fill_feed(instance, created, **kwargs):
+    if created:
+        backfill_timeline(instance.subscriber_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def clear_feed(instance, **kwargs):
+    drop_from_timeline(instance.subscriber_id, instance.author_id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Cart)
+def increase_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe.custom_objects.filter(pk=instance.recipe_id),
+                       f'{sender._meta.default_related_name}_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Cart)
+def decrease_recipe_counter(sender, instance, **kwargs):
+    change_counter(Recipe.custom_objects.filter(pk=instance.recipe_id),
+                   f'{sender._meta.default_related_name}_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def increase_author_counter(instance, created, **kwargs):
+    if created:
+        change_counter(User.objects.filter(pk=instance.author_id),
+                       'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_author_counter(instance, **kwargs):
+    change_counter(User.objects.filter(pk=instance.author_id),
+                   'recipes_count', -1)
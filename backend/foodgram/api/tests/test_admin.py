@@ -0,0 +1,55 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+
+class AdminChangelistQueryTests(TestCase):
+    # Число запросов страницы списка в админке не зависит от количества
+    # рецептов, тегов и продуктов на странице.
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com',
+            first_name='Админ', last_name='Админов', password='pass')
+        cls.tags = [Tag.objects.create(name=f'Тег {index}',
+                                       color=f'#00000{index}',
+                                       slug=f'tag-{index}')
+                    for index in range(3)]
+        cls.ingredients = [Ingredient.objects.create(
+            name=f'Продукт {index}', measurement_unit='г')
+            for index in range(3)]
+        cls.add_recipes(3)
+
+    @classmethod
+    def add_recipes(cls, count):
+        start = Recipe.custom_objects.count()
+        for index in range(start, start + count):
+            recipe = Recipe.custom_objects.create(
+                author=cls.admin, name=f'Рецепт {index}', text='Описание',
+                cooking_time=10)
+            recipe.tags.set(cls.tags)
+            for ingredient in cls.ingredients:
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=10)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def assert_queries(self, url, queries):
+        self.client.get(url)
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.add_recipes(6)
+        with self.assertNumQueries(queries):
+            self.client.get(url)
+
+    def test_recipe_changelist(self):
+        self.assert_queries('/admin/recipes/recipe/', 7)
+
+    def test_recipe_ingredient_changelist(self):
+        self.assert_queries('/admin/recipes/recipeingredient/', 4)
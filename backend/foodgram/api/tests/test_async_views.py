@@ -0,0 +1,16 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from api.async_views import async_patterns
+from api.urls import ASYNC_VIEWSETS, router_v1
+
+
+class AsyncPatternsTests(SimpleTestCase):
+    def test_streaming_download_stays_sync(self):
+        patterns = {pattern.name: pattern.callback for pattern in
+                    async_patterns(router_v1.urls, ASYNC_VIEWSETS)}
+        self.assertTrue(asyncio.iscoroutinefunction(
+            patterns['recipes-list']))
+        self.assertFalse(asyncio.iscoroutinefunction(
+            patterns['recipes-download-shopping-cart']))
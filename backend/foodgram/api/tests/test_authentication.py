@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import (CACHED_FIELDS, get_token_user,
+                                invalidate_token, local_tokens,
+                                set_token_user, token_cache_key)
+from users.models import User
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_tokens._items.clear()
+        self.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читателев', password='pass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cache_holds_no_password(self):
+        self.client.get('/api/recipes/')
+        cached = cache.get(token_cache_key(self.token.key))
+        self.assertEqual(dict(zip(CACHED_FIELDS, cached)), {
+            'id': self.user.id, 'is_active': True, 'is_staff': False,
+            'is_superuser': False})
+
+    def test_me_reads_profile(self):
+        self.client.get('/api/users/me/')
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.json()['email'], 'reader@example.com')
+
+    def test_revoked_token_is_not_cached_again(self):
+        user = User.objects.get(pk=self.user.pk)
+        invalidate_token(self.token.key)
+        set_token_user(self.token.key, user)
+        self.assertIsNone(get_token_user(self.token.key))
+
+    def test_deactivation_applies_after_commit(self):
+        self.assertEqual(self.client.get('/api/recipes/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save(update_fields=['is_active'])
+            self.assertIsNotNone(get_token_user(self.token.key))
+        self.assertEqual(self.client.get('/api/recipes/').status_code, 401)
+
+    def test_logout_applies_after_commit(self):
+        self.client.get('/api/recipes/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(self.client.get('/api/recipes/').status_code, 401)
@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.bulk import insert_rows
+from api.memberships import get_author_ids, get_recipe_ids
+from recipes.models import Favorite, FeedEntry, Recipe, Subscription
+from users.models import User
+
+
+class BulkEndpointsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читателев', password='pass')
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов', password='pass')
+        cls.recipes = [Recipe.custom_objects.create(
+            author=cls.author, name=f'Рецепт {index}', text='Описание',
+            cooking_time=10) for index in range(3)]
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def statuses(self, response):
+        return {item['id']: item['status']
+                for item in response.json()['results']}
+
+    def test_repeated_favorite_counts_once(self):
+        ids = [recipe.id for recipe in self.recipes]
+        for expected in ('created', 'exists'):
+            response = self.client.post('/api/recipes/favorite/',
+                                        {'ids': ids}, format='json')
+            self.assertEqual(set(self.statuses(response).values()),
+                             {expected})
+        self.assertEqual(
+            set(Recipe.custom_objects.values_list('favorites_count',
+                                                  flat=True)), {1})
+
+    def test_concurrent_insert_is_reported_once(self):
+        ids = [recipe.id for recipe in self.recipes]
+        self.assertEqual(
+            insert_rows(Favorite, 'user', 'recipe', self.user.id, ids),
+            set(ids))
+        self.assertEqual(
+            insert_rows(Favorite, 'user', 'recipe', self.user.id, ids),
+            set())
+
+    def test_membership_cache_reset_after_commit(self):
+        recipe_id = self.recipes[0].id
+        self.assertEqual(get_recipe_ids(Favorite, self.user.id), set())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/recipes/favorite/', {'ids': [recipe_id]},
+                             format='json')
+            self.assertEqual(get_recipe_ids(Favorite, self.user.id), set())
+        self.assertEqual(get_recipe_ids(Favorite, self.user.id),
+                         {recipe_id})
+
+    def test_subscribe_fills_feed_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/users/subscribe/', {'ids': [self.author.id]},
+                format='json')
+        self.assertEqual(self.statuses(response),
+                         {self.author.id: 'created'})
+        self.assertEqual(get_author_ids(self.user.id), {self.author.id})
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.user).count(), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete('/api/users/subscribe/',
+                               {'ids': [self.author.id]}, format='json')
+        self.assertFalse(Subscription.objects.exists())
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    def test_self_subscription_only_when_requested(self):
+        response = self.client.post(
+            '/api/users/subscribe/', {'ids': [self.author.id]},
+            format='json')
+        self.assertNotIn(self.user.id, self.statuses(response))
+        response = self.client.post(
+            '/api/users/subscribe/', {'ids': [self.user.id]}, format='json')
+        self.assertEqual(self.statuses(response),
+                         {self.user.id: 'self_subscription'})
+
+    def test_invalid_ids_are_rejected(self):
+        for ids in (['²'], [0], [-1], ['abc'], [True], [], 'x',
+                    list(range(1, settings.BULK_MAX_IDS + 2))):
+            response = self.client.post('/api/recipes/favorite/',
+                                        {'ids': ids}, format='json')
+            self.assertEqual(response.status_code, 400, ids)
+            self.assertEqual(response.json(), {
+                'ids': settings.NOT_LIST_IDS.format(
+                    limit=settings.BULK_MAX_IDS)})
+        self.assertFalse(Favorite.objects.exists())
@@ -0,0 +1,184 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (Cart, CartIngredient, Ingredient, Recipe,
+                            RecipeIngredient, Tag)
+from users.models import User
+
+
+class CartSummaryTests(TestCase):
+    # Сводка корзины после любой правки совпадает с суммой, посчитанной
+    # заново по составу рецептов в корзине.
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(name='Обед', color='#49B64E',
+                                     slug='lunch')
+        cls.ingredients = [Ingredient.objects.create(
+            name=f'Продукт {index}', measurement_unit='г')
+            for index in range(4)]
+        cls.author = User.objects.create_superuser(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов', password='pass')
+        cls.recipes = []
+        for index, amounts in enumerate(((10, 20, 0, 0), (0, 5, 7, 0))):
+            recipe = Recipe.custom_objects.create(
+                author=cls.author, name=f'Рецепт {index}', text='Описание',
+                cooking_time=10, image='recipes/images/recipe.png')
+            recipe.tags.set([cls.tag])
+            for ingredient, amount in zip(cls.ingredients, amounts):
+                if amount:
+                    RecipeIngredient.objects.create(
+                        recipe=recipe, ingredient=ingredient, amount=amount)
+            cls.recipes.append(recipe)
+        cls.users = [User.objects.create_user(
+            username=f'reader{index}', email=f'reader{index}@example.com',
+            first_name='Читатель', last_name='Читателев', password='pass')
+            for index in range(2)]
+        cls.tokens = [Token.objects.create(user=user).key
+                      for user in (*cls.users, cls.author)]
+
+    def setUp(self):
+        cache.clear()
+
+    def api(self, user_index):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.tokens[user_index]}')
+        return client
+
+    def fill_carts(self):
+        for user in self.users:
+            for recipe in self.recipes:
+                Cart.objects.create(user=user, recipe=recipe)
+
+    def assert_summaries(self, *expected):
+        for user, totals in zip(self.users, expected):
+            fresh = dict(RecipeIngredient.objects.filter(
+                recipe__carts__user=user).values_list(
+                'ingredient_id').annotate(total=Sum('amount')).order_by())
+            summary = dict(CartIngredient.objects.filter(
+                user=user).values_list('ingredient_id', 'total'))
+            self.assertEqual(summary, fresh)
+            self.assertEqual(
+                summary, {self.ingredients[index].id: total
+                          for index, total in enumerate(totals) if total})
+
+    def test_add_and_remove_recipes(self):
+        first, second = (f'/api/recipes/{recipe.id}/shopping_cart/'
+                         for recipe in self.recipes)
+        client = self.api(0)
+        client.post(first)
+        self.assert_summaries((10, 20, 0, 0))
+        client.post(second)
+        self.assert_summaries((10, 25, 7, 0))
+        client.delete(first)
+        self.assert_summaries((0, 5, 7, 0))
+        client.post('/api/recipes/shopping_cart/',
+                    {'ids': [recipe.id for recipe in self.recipes]},
+                    format='json')
+        self.assert_summaries((10, 25, 7, 0))
+        client.delete('/api/recipes/shopping_cart/',
+                      {'ids': [recipe.id for recipe in self.recipes]},
+                      format='json')
+        self.assert_summaries(())
+        self.assertFalse(CartIngredient.objects.exists())
+
+    def test_recipe_ingredients_edit(self):
+        self.fill_carts()
+        recipe = self.recipes[0]
+        response = self.api(2).patch(f'/api/recipes/{recipe.id}/', {
+            'tags': [self.tag.id],
+            'ingredients': [
+                {'id': self.ingredients[1].id, 'amount': 15},
+                {'id': self.ingredients[3].id, 'amount': 3},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_summaries((0, 20, 7, 3), (0, 20, 7, 3))
+
+    def test_recipe_delete(self):
+        self.fill_carts()
+        response = self.api(2).delete(f'/api/recipes/{self.recipes[1].id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assert_summaries((10, 20, 0, 0), (10, 20, 0, 0))
+
+    def test_admin_recipe_ingredient_edits(self):
+        self.fill_carts()
+        self.client.force_login(self.author)
+        row = RecipeIngredient.objects.get(recipe=self.recipes[0],
+                                           ingredient=self.ingredients[0])
+        url = f'/admin/recipes/recipeingredient/{row.id}/'
+        self.client.post(url + 'change/', {
+            'recipe': self.recipes[0].id,
+            'ingredient': self.ingredients[0].id, 'amount': 4})
+        self.assert_summaries((4, 25, 7, 0), (4, 25, 7, 0))
+        self.client.post(url + 'change/', {
+            'recipe': self.recipes[1].id,
+            'ingredient': self.ingredients[0].id, 'amount': 4})
+        self.assert_summaries((4, 25, 7, 0), (4, 25, 7, 0))
+        Cart.objects.filter(user=self.users[1],
+                            recipe=self.recipes[1]).delete()
+        self.assert_summaries((4, 25, 7, 0), (0, 20, 0, 0))
+        self.client.post(url + 'delete/', {'post': 'yes'})
+        self.assert_summaries((0, 25, 7, 0), (0, 20, 0, 0))
+        self.client.post('/admin/recipes/recipeingredient/', {
+            'action': 'delete_selected', 'post': 'yes',
+            '_selected_action': list(RecipeIngredient.objects.filter(
+                ingredient=self.ingredients[1]).values_list(
+                'id', flat=True))})
+        self.assert_summaries((0, 0, 7, 0), ())
+
+    def test_admin_recipe_inline_edit(self):
+        self.fill_carts()
+        self.client.force_login(self.author)
+        recipe = self.recipes[0]
+        rows = list(recipe.recipeingredients.order_by('id'))
+        data = {
+            'name': recipe.name, 'author': self.author.id,
+            'tags': [self.tag.id], 'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'recipeingredients-TOTAL_FORMS': 3,
+            'recipeingredients-INITIAL_FORMS': 2,
+            'recipeingredients-MIN_NUM_FORMS': 1,
+            'recipeingredients-MAX_NUM_FORMS': 1000,
+        }
+        for index, (row, amount, delete) in enumerate(
+                ((rows[0], 30, ''), (rows[1], 20, 'on'))):
+            data.update({
+                f'recipeingredients-{index}-id': row.id,
+                f'recipeingredients-{index}-recipe': recipe.id,
+                f'recipeingredients-{index}-ingredient': row.ingredient_id,
+                f'recipeingredients-{index}-amount': amount,
+                f'recipeingredients-{index}-DELETE': delete,
+            })
+        data.update({
+            'recipeingredients-2-recipe': recipe.id,
+            'recipeingredients-2-ingredient': self.ingredients[3].id,
+            'recipeingredients-2-amount': 2,
+        })
+        response = self.client.post(
+            f'/admin/recipes/recipe/{recipe.id}/change/', data)
+        self.assertEqual(response.status_code, 302)
+        self.assert_summaries((30, 5, 7, 2), (30, 5, 7, 2))
+
+    def test_rebuild_command_fixes_drift(self):
+        self.fill_carts()
+        CartIngredient.objects.filter(user=self.users[0]).update(total=1)
+        CartIngredient.objects.filter(user=self.users[1]).delete()
+        CartIngredient.objects.create(user=self.author,
+                                      ingredient=self.ingredients[3],
+                                      total=5)
+        out = StringIO()
+        call_command('rebuild_cart_summaries', '--batch-size', '1',
+                     stdout=out)
+        self.assertIn('Пересчитано сводок корзин: 3', out.getvalue())
+        self.assert_summaries((10, 25, 7, 0), (10, 25, 7, 0))
+        self.assertFalse(CartIngredient.objects.filter(
+            user=self.author).exists())
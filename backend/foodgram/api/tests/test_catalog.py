@@ -0,0 +1,52 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from api.catalog import get_catalog_version
+from recipes.models import Ingredient, Tag
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_version_changes_after_commit(self):
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Завтрак', color='#E26C2D',
+                               slug='breakfast')
+            self.assertEqual(get_catalog_version(), version)
+        self.assertGreater(get_catalog_version(), version)
+
+    def test_responses_vary_on_accept(self):
+        response = self.client.get('/api/tags/')
+        cached = self.client.get('/api/tags/')
+        not_modified = self.client.get(
+            '/api/tags/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        for response in (response, cached, not_modified):
+            self.assertIn('Accept', response['Vary'])
+
+    def catalog_keys(self):
+        return [key for key in cache._cache if ':catalog:' in key]
+
+    def test_query_params_do_not_create_cache_entries(self):
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+        for params in ({'page': 1}, {'x': 'y'}, {'name': 'кокос'},
+                       {'name': 'соль', 'x': 'y'}):
+            self.assertEqual(
+                self.client.get('/api/ingredients/', params).status_code,
+                200)
+        self.client.get('/api/tags/', {'x': 'y'})
+        self.client.get('/api/tags/1/')
+        self.assertEqual(self.catalog_keys(), [])
+
+    def test_list_and_normalized_name_are_cached(self):
+        Ingredient.objects.create(name='Свёкла', measurement_unit='г')
+        self.client.get('/api/tags/')
+        self.client.get('/api/ingredients/')
+        for name in ('Свек', ' СВЁК ', 'свек'):
+            response = self.client.get('/api/ingredients/', {'name': name})
+            self.assertEqual([row['name'] for row in response.json()],
+                             ['Свёкла'])
+        self.client.get('/api/ingredients/', {'search': 'свек'})
+        self.assertEqual(len(self.catalog_keys()), 3)
@@ -0,0 +1,104 @@
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from api.catalog import get_catalog_version
+from recipes.models import (Cart, Favorite, FeedEntry, Ingredient, Recipe,
+                            Subscription, Tag)
+from users.models import User
+
+
+class LoadFoodgramDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.data_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.data_dir)
+        self.ingredients = self.data_dir / 'ingredients.csv'
+        self.ingredients.write_text(
+            'соль,г\nсахар,г\nсоль,г\nсоль,щепотка\n\nмолоко,мл\n',
+            encoding='utf-8')
+        self.tags = self.data_dir / 'tags.csv'
+        self.tags.write_text(
+            'Завтрак,#E26C2D,breakfast\nОбед,#49B64E,lunch\n',
+            encoding='utf-8')
+
+    def load(self, *args):
+        call_command('load_foodgram_data', str(self.ingredients),
+                     str(self.tags), '--batch-size', '2', *args)
+
+    def test_duplicates_are_loaded_once(self):
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.load()
+        self.assertEqual(
+            sorted(Ingredient.objects.values_list('name',
+                                                  'measurement_unit')),
+            [('молоко', 'мл'), ('сахар', 'г'), ('соль', 'г'),
+             ('соль', 'щепотка')])
+        self.assertEqual(Tag.objects.count(), 2)
+        self.assertGreater(get_catalog_version(), version)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.load()
+        self.assertEqual(Ingredient.objects.count(), 4)
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_dry_run_writes_nothing(self):
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.load('--dry-run')
+        self.assertFalse(Ingredient.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+        self.assertEqual(get_catalog_version(), version)
+
+
+class SeedFoodgramTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_small_seed_is_consistent(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('seed_foodgram', users=20, recipes=60,
+                         ingredients=10, tags=3, follows=3, favorites=3,
+                         carts=2, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Recipe.custom_objects.count(), 60)
+        self.assertGreaterEqual(Ingredient.objects.count(), 10)
+        self.assertGreaterEqual(Tag.objects.count(), 3)
+        for model in (Subscription, Favorite, Cart, FeedEntry):
+            self.assertTrue(model.objects.exists(), model.__name__)
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('Исправлено рецептов: 0, пользователей: 0',
+                      out.getvalue())
+
+
+class BenchmarkApiTests(SimpleTestCase):
+    # Команда сама создает тестовую базу, поэтому запускается отдельным
+    # процессом.
+
+    def test_small_run_saves_baseline(self):
+        workdir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, workdir)
+        baseline = workdir / 'baseline.json'
+        command = [sys.executable, 'manage.py', 'benchmark_api',
+                   '--requests', '4', '--concurrency', '2', '--users', '6',
+                   '--recipes', '20', '--baseline', str(baseline)]
+        for extra in (['--save'], []):
+            result = subprocess.run(
+                command + extra, cwd=settings.BASE_DIR, capture_output=True,
+                text=True, timeout=300)
+            self.assertEqual(result.returncode, 0, result.stderr)
+        scenarios = json.loads(baseline.read_text())['scenarios']
+        self.assertTrue(scenarios)
+        for name, metrics in scenarios.items():
+            self.assertEqual(metrics['errors'], 0, name)
+            self.assertIn(name, result.stdout)
@@ -0,0 +1,81 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import User
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читателев', password='pass')
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов', password='pass')
+        cls.recipes = [Recipe.custom_objects.create(
+            author=cls.author, name=f'Рецепт {index}', text='Описание',
+            cooking_time=10) for index in range(3)]
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def counters(self, field):
+        return list(Recipe.custom_objects.filter(
+            pk__in=[recipe.pk for recipe in self.recipes]).order_by(
+            'pk').values_list(field, flat=True))
+
+    def recipes_count(self):
+        self.author.refresh_from_db()
+        return self.author.recipes_count
+
+    def test_single_endpoints_move_counters(self):
+        recipe = self.recipes[0]
+        for url, field in ((f'/api/recipes/{recipe.id}/favorite/',
+                            'favorites_count'),
+                           (f'/api/recipes/{recipe.id}/shopping_cart/',
+                            'carts_count')):
+            self.assertEqual(self.client.post(url).status_code, 201)
+            self.assertEqual(self.counters(field), [1, 0, 0])
+            self.assertEqual(self.client.delete(url).status_code, 204)
+            self.assertEqual(self.counters(field), [0, 0, 0])
+
+    def test_bulk_endpoints_move_counters(self):
+        ids = [recipe.id for recipe in self.recipes[:2]]
+        for url, field in (('/api/recipes/favorite/', 'favorites_count'),
+                           ('/api/recipes/shopping_cart/', 'carts_count')):
+            self.client.post(url, {'ids': ids}, format='json')
+            self.assertEqual(self.counters(field), [1, 1, 0])
+            self.client.delete(url, {'ids': ids + [self.recipes[2].id]},
+                               format='json')
+            self.assertEqual(self.counters(field), [0, 0, 0])
+
+    def test_recipes_count_follows_author_recipes(self):
+        self.assertEqual(self.recipes_count(), 3)
+        self.recipes[0].delete()
+        self.assertEqual(self.recipes_count(), 2)
+
+    def test_reconcile_fixes_drifted_counters(self):
+        self.client.post('/api/recipes/favorite/',
+                         {'ids': [self.recipes[0].id]}, format='json')
+        Recipe.custom_objects.filter(pk=self.recipes[0].pk).update(
+            favorites_count=5)
+        Recipe.custom_objects.filter(pk=self.recipes[1].pk).update(
+            carts_count=2)
+        User.objects.filter(pk=self.author.pk).update(recipes_count=0)
+        out = StringIO()
+        call_command('reconcile_counters', '--batch-size', '2', stdout=out)
+        self.assertIn('Исправлено рецептов: 2, пользователей: 1',
+                      out.getvalue())
+        self.assertEqual(self.counters('favorites_count'), [1, 0, 0])
+        self.assertEqual(self.counters('carts_count'), [0, 0, 0])
+        self.assertEqual(self.recipes_count(), 3)
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import FeedEntry, Recipe
+from users.models import User
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читателев', password='pass')
+        cls.pushed, cls.pulled = [User.objects.create_user(
+            username=f'author{index}', email=f'author{index}@example.com',
+            first_name='Автор', last_name='Авторов', password='pass')
+            for index in range(2)]
+        User.objects.filter(pk=cls.pulled.pk).update(feed_on_read=True)
+        now = timezone.now()
+        cls.expected = []
+        for index in range(6):
+            author = (cls.pushed, cls.pulled)[index % 2]
+            recipe = Recipe.custom_objects.create(
+                author=author, name=f'Рецепт {index}', text='Описание',
+                cooking_time=10)
+            Recipe.custom_objects.filter(pk=recipe.pk).update(
+                pub_date=now - timedelta(minutes=index))
+            cls.expected.append(recipe.id)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def read_feed(self):
+        ids = []
+        url = '/api/recipes/feed/?limit=4'
+        while url:
+            data = self.client.get(url).json()
+            self.assertLessEqual(len(data['results']), 4)
+            ids.extend(recipe['id'] for recipe in data['results'])
+            url = data['next']
+        return ids
+
+    def subscribe(self, method, author):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(
+                f'/api/users/{author.id}/subscribe/')
+        self.assertLess(response.status_code, 300)
+
+    def test_push_and_pull_authors_are_merged_across_pages(self):
+        self.assertEqual(self.read_feed(), [])
+        self.subscribe('post', self.pushed)
+        self.assertEqual(self.read_feed(), self.expected[::2])
+        self.subscribe('post', self.pulled)
+        self.assertEqual(FeedEntry.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(self.read_feed(), self.expected)
+
+    def test_unsubscribe_empties_feed(self):
+        self.subscribe('post', self.pushed)
+        self.subscribe('post', self.pulled)
+        self.subscribe('delete', self.pushed)
+        self.assertEqual(self.read_feed(), self.expected[1::2])
+        self.subscribe('delete', self.pulled)
+        self.assertEqual(self.read_feed(), [])
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    def test_new_recipe_of_pushed_author_reaches_feed(self):
+        self.subscribe('post', self.pushed)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.custom_objects.create(
+                author=self.pushed, name='Новый рецепт', text='Описание',
+                cooking_time=10)
+        self.assertEqual(self.read_feed()[0], recipe.id)
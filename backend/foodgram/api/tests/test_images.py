@@ -0,0 +1,58 @@
+import shutil
+import tempfile
+from concurrent.futures import Future
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from api.images import report_failure
+from recipes.models import Recipe
+from users.models import User
+
+
+class ImageRenditionsTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        executor = mock.patch('api.images.executor', None)
+        executor.start()
+        self.addCleanup(executor.stop)
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов', password='pass')
+
+    def create_recipe(self):
+        buffer = BytesIO()
+        Image.new('RGB', (800, 600), 'orange').save(buffer, 'PNG')
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.custom_objects.create(
+                author=self.author, name='Рецепт', text='Описание',
+                cooking_time=10, image=SimpleUploadedFile(
+                    'recipe.png', buffer.getvalue(), 'image/png'))
+        recipe.refresh_from_db()
+        return recipe
+
+    def test_renditions_deleted_with_recipe(self):
+        recipe = self.create_recipe()
+        paths = [path for name, path in recipe.image_renditions.items()
+                 if name != 'source']
+        self.assertTrue(paths)
+        self.assertTrue(all(default_storage.exists(path) for path in paths))
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertFalse(any(default_storage.exists(path)
+                             for path in paths))
+
+    def test_worker_failure_is_logged(self):
+        future = Future()
+        future.set_exception(OSError('broken image'))
+        with self.assertLogs('api.images', 'ERROR') as logs:
+            report_failure(42, future)
+        self.assertIn('42', logs.output[0])
@@ -0,0 +1,46 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from api.indexes import IngredientIndex
+from recipes.models import Ingredient
+
+
+class IngredientIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('Соль морская', 'Сахар', 'Масло сливочное',
+                     'Перец черный', 'Свёкла', 'Фасоль'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def setUp(self):
+        cache.clear()
+        self.index = IngredientIndex()
+
+    def names(self, term):
+        return [row['name'] for row in self.index.search(term)]
+
+    def test_prefix_matches_come_before_substrings(self):
+        self.assertEqual(self.names('СОЛ'), ['Соль морская', 'Фасоль'])
+
+    def test_trigram_search_finds_middle_of_name(self):
+        self.assertEqual(self.names('сливоч'), ['Масло сливочное'])
+        self.assertEqual(self.names('черн'), ['Перец черный'])
+
+    def test_short_terms_and_yo(self):
+        self.assertEqual(self.names('ах'), ['Сахар'])
+        self.assertEqual(self.names('свек'), ['Свёкла'])
+        self.assertEqual(self.names('кокос'), [])
+
+    def test_rebuild_after_catalog_version_changes(self):
+        self.assertEqual(self.names('кокос'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Кокосовое молоко',
+                                      measurement_unit='мл')
+            self.assertEqual(self.names('кокос'), [])
+        self.assertEqual(self.names('кокос'), ['Кокосовое молоко'])
+
+    def test_api_uses_index(self):
+        response = self.client.get('/api/ingredients/', {'name': 'сол'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['name'] for row in response.json()],
+                         ['Соль морская', 'Фасоль'])
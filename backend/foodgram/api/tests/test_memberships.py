@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.memberships import FOLLOWING_KEY, membership_key
+from recipes.models import Favorite, Recipe, Subscription
+from users.models import User
+
+
+class MembershipCacheTests(TestCase):
+    # Параллельный запрос может закэшировать старый набор, пока транзакция
+    # записи не закоммичена; сброс после коммита его убирает.
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читателев', password='pass')
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов', password='pass')
+        cls.recipe = Recipe.custom_objects.create(
+            author=cls.author, name='Рецепт', text='Описание',
+            cooking_time=10)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_favorite_added_in_transaction_shows_on_next_get(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        self.assertFalse(self.client.get(url).json()['is_favorited'])
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Favorite.objects.create(user=self.user, recipe=self.recipe)
+                cache.set(membership_key(Favorite, self.user.id),
+                          frozenset())
+        self.assertTrue(self.client.get(url).json()['is_favorited'])
+
+    def test_subscription_added_in_transaction_shows_on_next_get(self):
+        url = f'/api/users/{self.author.id}/'
+        self.assertFalse(self.client.get(url).json()['is_subscribed'])
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Subscription.objects.create(subscriber=self.user,
+                                            author=self.author)
+                cache.set(FOLLOWING_KEY.format(user_id=self.user.id),
+                          frozenset())
+        self.assertTrue(self.client.get(url).json()['is_subscribed'])
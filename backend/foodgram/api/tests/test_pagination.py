@@ -0,0 +1,50 @@
+from base64 import urlsafe_b64encode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from recipes.models import Recipe
+from users.models import User
+
+
+class RecipeCursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов', password='pass')
+        for index in range(14):
+            Recipe.custom_objects.create(
+                author=author, name=f'Рецепт {index}', text='Описание',
+                cooking_time=10)
+        Recipe.custom_objects.update(pub_date=timezone.now())
+
+    def setUp(self):
+        cache.clear()
+
+    def test_same_pub_date_pages_without_duplicates_or_gaps(self):
+        ids = []
+        pages = []
+        url = '/api/recipes/?limit=5&cursor='
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            pages.append(len(data['results']))
+            ids.extend(recipe['id'] for recipe in data['results'])
+            url = data['next']
+        self.assertEqual(pages, [5, 5, 4])
+        self.assertEqual(ids, sorted(Recipe.custom_objects.values_list(
+            'id', flat=True)))
+
+    def test_invalid_cursor_returns_404(self):
+        for cursor in ('abc', '!!!', 'ё',
+                       urlsafe_b64encode(b'not-a-date|1').decode(),
+                       urlsafe_b64encode(
+                           b'2024-01-01T00:00:00+00:00|x').decode()):
+            response = self.client.get('/api/recipes/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+            self.assertEqual(response.json()['detail'],
+                             settings.INVALID_CURSOR)
@@ -0,0 +1,176 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.serializers import RecipeSerializerWrite
+from recipes.models import (Cart, Favorite, Ingredient, Recipe,
+                            RecipeIngredient, Subscription, Tag)
+from users.models import User
+
+AUTHORS = 3
+RECIPES_PER_AUTHOR = 3
+
+
+class QueryCountTests(TestCase):
+    # Количество запросов к БД на чтение не должно расти вместе с числом
+    # рецептов, тегов, продуктов и подписок на странице. Первый запрос
+    # прогревает кэши, проверяется повторный.
+
+    @classmethod
+    def setUpTestData(cls):
+        tags = [Tag.objects.create(name=f'Тег {index}',
+                                   color=f'#00000{index}',
+                                   slug=f'tag-{index}')
+                for index in range(3)]
+        ingredients = [Ingredient.objects.create(
+            name=f'Продукт {index}', measurement_unit='г')
+            for index in range(5)]
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читателев', password='pass')
+        cls.recipes = []
+        for number in range(AUTHORS):
+            author = User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+                first_name='Автор', last_name=f'Авторов {number}',
+                password='pass')
+            for index in range(RECIPES_PER_AUTHOR):
+                recipe = Recipe.custom_objects.create(
+                    author=author, name=f'Рецепт {number}-{index}',
+                    text='Описание', cooking_time=10)
+                recipe.tags.set(tags[index:index + 2])
+                for position, ingredient in enumerate(
+                        ingredients[index:index + 3], 1):
+                    RecipeIngredient.objects.create(
+                        recipe=recipe, ingredient=ingredient,
+                        amount=position * 10)
+                cls.recipes.append(recipe)
+            if number:
+                Subscription.objects.create(subscriber=cls.reader,
+                                            author=author)
+        for recipe in cls.recipes[:2]:
+            Favorite.objects.create(user=cls.reader, recipe=recipe)
+            Cart.objects.create(user=cls.reader, recipe=recipe)
+        cls.token = Token.objects.create(user=cls.reader)
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.authorized = APIClient()
+        self.authorized.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def assert_queries(self, client, url, queries, status=200):
+        client.get(url)
+        with self.assertNumQueries(queries):
+            response = client.get(url)
+        self.assertEqual(response.status_code, status)
+
+    def test_recipe_list_anonymous(self):
+        self.assert_queries(self.anonymous, '/api/recipes/', 5)
+
+    def test_recipe_list_authorized(self):
+        self.assert_queries(self.authorized, '/api/recipes/', 5)
+
+    def test_recipe_detail_anonymous(self):
+        self.assert_queries(
+            self.anonymous, f'/api/recipes/{self.recipes[0].id}/', 4)
+
+    def test_recipe_detail_authorized(self):
+        self.assert_queries(
+            self.authorized, f'/api/recipes/{self.recipes[0].id}/', 4)
+
+    def test_subscriptions_anonymous(self):
+        self.assert_queries(
+            self.anonymous, '/api/users/subscriptions/', 0, status=401)
+
+    def test_subscriptions_authorized(self):
+        self.assert_queries(
+            self.authorized, '/api/users/subscriptions/', 3)
+
+    def test_user_list_anonymous(self):
+        self.assert_queries(self.anonymous, '/api/users/', 0, status=401)
+
+    def test_user_list_authorized(self):
+        self.assert_queries(self.authorized, '/api/users/', 2)
+
+    def test_recipe_list_filtered_by_tags(self):
+        self.assert_queries(
+            self.anonymous, '/api/recipes/?tags=tag-0&tags=tag-1', 5)
+
+    def test_recipe_list_filtered_by_unknown_tag(self):
+        self.assert_queries(self.anonymous, '/api/recipes/?tags=missing', 0,
+                            status=400)
+
+    def test_first_by_author_is_one_query(self):
+        author_ids = {recipe.author_id for recipe in self.recipes}
+        with self.assertNumQueries(1):
+            recipes = list(Recipe.custom_objects.first_by_author(
+                author_ids, 2))
+        self.assertEqual(len(recipes), 2 * len(author_ids))
+        with self.assertNumQueries(1):
+            recipes = list(Recipe.custom_objects.first_by_author(
+                author_ids))
+        self.assertEqual(len(recipes), len(self.recipes))
+
+
+class UpdateIngredientsQueryTests(TestCase):
+    # Правка рецепта пишет только измененные строки состава; нетронутые
+    # строки сохраняют свои id.
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ingredients = [Ingredient.objects.create(
+            name=f'Продукт {index}', measurement_unit='г')
+            for index in range(4)]
+        user = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов', password='pass')
+        cls.recipe = Recipe.custom_objects.create(
+            author=user, name='Рецепт', text='Описание', cooking_time=10)
+        for ingredient in cls.ingredients[:3]:
+            RecipeIngredient.objects.create(
+                recipe=cls.recipe, ingredient=ingredient, amount=10)
+        Cart.objects.create(user=user, recipe=cls.recipe)
+
+    def update(self, amounts, queries, writes):
+        stored = dict(self.recipe.recipeingredients.values_list(
+            'ingredient_id', 'id'))
+        submitted = [{'id': ingredient.id, 'amount': amount}
+                     for ingredient, amount in zip(self.ingredients, amounts)
+                     if amount]
+        with CaptureQueriesContext(connection) as context:
+            with self.assertNumQueries(queries):
+                RecipeSerializerWrite().update_ingredients(submitted,
+                                                           self.recipe)
+        self.assertEqual(
+            [query['sql'].split()[0] for query in context.captured_queries
+             if not query['sql'].startswith('SELECT')
+             and '"recipes_recipeingredient"' in query['sql']], writes)
+        rows = dict(self.recipe.recipeingredients.values_list(
+            'ingredient_id', 'id'))
+        kept = [ingredient.id for ingredient, amount in
+                zip(self.ingredients, amounts) if amount == 10]
+        self.assertEqual({pk: rows[pk] for pk in kept},
+                         {pk: stored[pk] for pk in kept})
+        self.assertEqual(
+            dict(self.recipe.recipeingredients.values_list(
+                'ingredient_id', 'amount')),
+            {ingredient.id: amount for ingredient, amount in
+             zip(self.ingredients, amounts) if amount})
+
+    def test_unchanged_ingredients_are_not_written(self):
+        self.update((10, 10, 10, None), 1, [])
+
+    def test_only_changed_amount_is_updated(self):
+        self.update((10, 20, 10, None), 3, ['UPDATE'])
+
+    def test_only_removed_ingredient_is_deleted(self):
+        self.update((10, None, 10, None), 5, ['DELETE'])
+
+    def test_only_new_ingredient_is_inserted(self):
+        self.update((10, 10, 10, 5), 3, ['INSERT'])
@@ -0,0 +1,71 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe
+from users.models import User
+
+REPLICA = 'replica'
+
+# Отдельная тестовая SQLite без MIRROR: строка, записанная только в нее,
+# видна лишь запросам, которые роутер отправил на реплику.
+connections.databases.setdefault(REPLICA, {
+    'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:',
+    'TEST': {'NAME': None},
+})
+
+
+@override_settings(REPLICA_DATABASES=[REPLICA])
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', REPLICA}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читателев', password='pass')
+        cls.recipe = Recipe.custom_objects.create(
+            author=cls.reader, name='На основной', text='Описание',
+            cooking_time=10)
+        author = User.objects.db_manager(REPLICA).create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов', password='pass')
+        Recipe.custom_objects.using(REPLICA).create(
+            author=author, name='На реплике', text='Описание',
+            cooking_time=10)
+        cls.token = Token.objects.create(user=cls.reader)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def names(self):
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_safe_reads_go_to_replica(self):
+        self.assertEqual(self.names(), ['На реплике'])
+        self.assertEqual(APIClient().get('/api/recipes/').json()['count'], 1)
+
+    def test_writes_go_to_primary_and_pin_the_writer(self):
+        response = self.client.post(
+            f'/api/recipes/{self.recipe.id}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Favorite.objects.using('default').exists())
+        self.assertFalse(Favorite.objects.using(REPLICA).exists())
+        self.assertEqual(self.names(), ['На основной'])
+        self.assertEqual(
+            [recipe['name'] for recipe in APIClient().get(
+                '/api/recipes/').json()['results']], ['На реплике'])
+        expired = time.time() + settings.REPLICA_PIN_SECONDS + 1
+        with mock.patch('django.core.cache.backends.locmem.time.time',
+                        return_value=expired):
+            self.assertEqual(self.names(), ['На реплике'])
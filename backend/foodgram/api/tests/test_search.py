@@ -0,0 +1,39 @@
+from django.test import TestCase
+
+from api.search import update_search_index
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from users.models import User
+
+
+class RecipeSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов', password='pass')
+        beet = Ingredient.objects.create(name='свекла', measurement_unit='г')
+        cls.by_name = Recipe.custom_objects.create(
+            author=author, name='Свекла печеная', text='Запечь.',
+            cooking_time=40)
+        cls.by_ingredient = Recipe.custom_objects.create(
+            author=author, name='Борщ', text='Сварить.', cooking_time=90)
+        RecipeIngredient.objects.create(recipe=cls.by_ingredient,
+                                        ingredient=beet, amount=200)
+        cls.by_text = Recipe.custom_objects.create(
+            author=author, name='Винегрет', text='Нарезать свеклу.',
+            cooking_time=30)
+        Recipe.custom_objects.create(
+            author=author, name='Омлет', text='Взбить яйца.', cooking_time=10)
+        # Индекс обновляется после коммита, а тест идет в транзакции.
+        update_search_index(
+            Recipe.custom_objects.values_list('id', flat=True))
+
+    def test_ranks_all_matches_by_field_weight(self):
+        first = self.client.get(
+            '/api/recipes/', {'search': 'свекл', 'limit': 2}).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(first['count'], 3)
+        found = [recipe['id']
+                 for recipe in first['results'] + second['results']]
+        self.assertEqual(
+            found, [self.by_name.id, self.by_ingredient.id, self.by_text.id])
@@ -0,0 +1,124 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Subscription, Tag
+from users.models import User
+
+
+class QueryParamsValidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читателев', password='pass')
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов', password='pass')
+        for index in range(3):
+            Recipe.custom_objects.create(
+                author=cls.author, name=f'Рецепт {index}', text='Описание',
+                cooking_time=10)
+        Subscription.objects.create(subscriber=cls.user, author=cls.author)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_recipes_limit_ignores_non_decimal_digits(self):
+        response = self.client.get('/api/users/subscriptions/',
+                                   {'recipes_limit': '²'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results'][0]['recipes']), 3)
+        response = self.client.get('/api/users/subscriptions/',
+                                   {'recipes_limit': '1'})
+        self.assertEqual(len(response.json()['results'][0]['recipes']), 1)
+
+
+class RecipeValidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов', password='pass')
+        cls.tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                     slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(name='Соль',
+                                                   measurement_unit='г')
+        cls.token = Token.objects.create(user=cls.user)
+        buffer = BytesIO()
+        Image.new('RGB', (2, 2), 'orange').save(buffer, 'PNG')
+        cls.image = 'data:image/png;base64,{}'.format(
+            base64.b64encode(buffer.getvalue()).decode())
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def post(self, ingredients=None, tags=None):
+        return self.client.post('/api/recipes/', {
+            'ingredients': ingredients or [
+                {'id': self.ingredient.id, 'amount': 10}],
+            'tags': tags or [self.tag.id],
+            'image': self.image,
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+        }, format='json')
+
+    def assert_error(self, response, errors):
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), errors)
+        self.assertFalse(Recipe.custom_objects.exists())
+
+    def test_valid_recipe_is_created(self):
+        self.assertEqual(self.post().status_code, 201)
+
+    def test_duplicate_ingredient(self):
+        ingredient = {'id': self.ingredient.id, 'amount': 10}
+        self.assert_error(
+            self.post(ingredients=[ingredient, ingredient]),
+            {'ingredients': settings.DUPLICATE_INGREDIENTS.format(
+                ingredient=ingredient)})
+
+    def test_unknown_ingredient(self):
+        for pk in (self.ingredient.id + 1, '²', 'abc'):
+            ingredient = {'id': pk, 'amount': 10}
+            self.assert_error(
+                self.post(ingredients=[ingredient]),
+                {'ingredients': settings.NO_INGREDIENT.format(
+                    ingredient=ingredient)})
+
+    def test_amount_must_be_positive_integer(self):
+        for amount in ('abc', '²', 0, -5, 1.5, True):
+            ingredient = {'id': self.ingredient.id, 'amount': amount}
+            self.assert_error(
+                self.post(ingredients=[ingredient]),
+                {'amount': settings.NOT_POSITIVE_INTEGER.format(
+                    ingredient=ingredient)})
+
+    def test_duplicate_tag(self):
+        self.assert_error(
+            self.post(tags=[self.tag.id, self.tag.id]),
+            {'tags': [settings.DUPLICATE_TAGS.format(tag=self.tag.id)]})
+
+    def test_unknown_tag(self):
+        self.assert_error(
+            self.post(tags=[self.tag.id + 1]),
+            {'tags': [settings.NO_TAG.format(tag=self.tag.id + 1)]})
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from api.async_views import async_patterns
 from api.views import (IngredientViewSet, UserViewSet,
                        RecipeViewSet, SubscriptionViewSet, TagViewSet)
 
@@ -11,8 +13,13 @@ router_v1.register(r'recipes', RecipeViewSet, basename='recipes')
 router_v1.register(r'users/subscriptions', SubscriptionViewSet,
                    basename='subscriptions')
 router_v1.register('users', UserViewSet, basename='users')
+ASYNC_VIEWSETS = (TagViewSet, IngredientViewSet, RecipeViewSet,
+                  SubscriptionViewSet)
 
+router_urls = router_v1.urls
+if settings.ASYNC_API:
+    router_urls = async_patterns(router_urls, ASYNC_VIEWSETS)
 
 urlpatterns = [
-    path('', include(router_v1.urls)),
+    path('', include(router_urls)),
 ]
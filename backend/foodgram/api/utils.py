@@ -1,11 +1,18 @@
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
 from django.conf import settings
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework import serializers
 from rest_framework.response import Response
 
-from recipes.models import Recipe, Ingredient
+from recipes.models import Ingredient, Recipe, Tag
+
+SEARCH_PARAMS = {'name', 'search'}
 
 
 def create_favorite_cart(serial, request, pk=None):
@@ -28,20 +35,98 @@ def get_author(request):
     return request.parser_context.get('kwargs').get('pk')
 
 
-def generate_cart(queryset):
-    msg = ''
-    for item in queryset:
-        msg += (f'{item["ingredient__name"]}, '
-                f'({item["ingredient__measurement_unit"]}) '
-                f'{item["total"]}') + '\n'
-    response = HttpResponse(msg, content_type='text/plain')
+def get_search_term(query_params):
+    return query_params.get('name') or query_params.get('search')
+
+
+def get_recipes_limit(request):
+    recipes_limit = request.query_params.get('recipes_limit', '')
+    if recipes_limit.isdecimal():
+        return int(recipes_limit)
+    return None
+
+
+def attach_author_recipes(authors, recipes_limit=None):
+    recipes = defaultdict(list)
+    if recipes_limit != 0:
+        ranked = Recipe.custom_objects.first_by_author(
+            [author.id for author in authors], recipes_limit)
+        for recipe in ranked:
+            recipes[recipe.author_id].append(recipe)
+    for author in authors:
+        author.limited_recipes = recipes[author.id]
+    return authors
+
+
+class Echo:
+    # Псевдобуфер для csv.writer: отдает строку вместо записи в файл.
+    def write(self, value):
+        return value
+
+
+def cart_lines_txt(rows):
+    for item in rows:
+        yield (f'{item["ingredient__name"]}, '
+               f'({item["ingredient__measurement_unit"]}) '
+               f'{item["total"]}\n')
+
+
+def cart_lines_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for item in rows:
+        yield writer.writerow((item['ingredient__name'],
+                               item['ingredient__measurement_unit'],
+                               item['total']))
+
+
+def cart_lines_json(rows):
+    yield '['
+    separator = ''
+    for item in rows:
+        yield separator + json.dumps(
+            {'name': item['ingredient__name'],
+             'measurement_unit': item['ingredient__measurement_unit'],
+             'amount': item['total']},
+            ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+CART_FORMATS = {
+    'txt': (cart_lines_txt, 'text/plain'),
+    'csv': (cart_lines_csv, 'text/csv'),
+    'json': (cart_lines_json, 'application/json'),
+}
+
+
+def chunked(lines, size):
+    lines = iter(lines)
+    while True:
+        chunk = ''.join(islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def generate_cart(queryset, file_format='txt'):
+    if file_format not in CART_FORMATS:
+        raise serializers.ValidationError(
+            {'format': settings.NOT_CART_FORMAT.format(
+                file_format=file_format,
+                formats=', '.join(CART_FORMATS))})
+    lines, content_type = CART_FORMATS[file_format]
+    rows = queryset.iterator(chunk_size=settings.CART_CHUNK_SIZE)
+    response = StreamingHttpResponse(
+        chunked(lines(rows), settings.CART_CHUNK_SIZE),
+        content_type=f'{content_type}; charset=utf-8')
     response['Content-Disposition'] = (
-        'attachment; filename=foodgram_products.txt')
+        f'attachment; filename={settings.CART_FILENAME}.{file_format}')
     return response
 
 
 def check_ingredients(ingredients):
-    ingredient_ids = []
+    ingredient_ids = set()
     for ingredient in ingredients:
         if 'amount' not in ingredient:
             raise serializers.ValidationError(
@@ -51,13 +136,39 @@ def check_ingredients(ingredients):
             raise serializers.ValidationError(
                 {'id': settings.MUST_HAVE_FIELD_ID.format(
                     ingredient=ingredient)})
-        if not Ingredient.objects.filter(id=ingredient['id']).exists():
+        amount = str(ingredient['amount'])
+        if not amount.isdecimal() or int(amount) < settings.MINVALUE:
             raise serializers.ValidationError(
-                {'ingredients': settings.NO_INGREDIENT.format(
+                {'amount': settings.NOT_POSITIVE_INTEGER.format(
                     ingredient=ingredient)})
-        ingredient_ids.append(ingredient['id'])
-        if len(ingredient_ids) != len(set(ingredient_ids)):
+        if str(ingredient['id']) in ingredient_ids:
             raise serializers.ValidationError(
                 {'ingredients': settings.DUPLICATE_INGREDIENTS.format(
                     ingredient=ingredient)})
+        ingredient_ids.add(str(ingredient['id']))
+    existing_ids = {
+        str(pk) for pk in Ingredient.objects.filter(
+            id__in=[pk for pk in ingredient_ids if pk.isdecimal()]
+        ).values_list('id', flat=True)
+    }
+    for ingredient in ingredients:
+        if str(ingredient['id']) not in existing_ids:
+            raise serializers.ValidationError(
+                {'ingredients': settings.NO_INGREDIENT.format(
+                    ingredient=ingredient)})
     return ingredients
+
+
+def check_tags(tags):
+    tag_ids = set()
+    for tag in tags:
+        if tag in tag_ids:
+            raise serializers.ValidationError(
+                settings.DUPLICATE_TAGS.format(tag=tag))
+        tag_ids.add(tag)
+    found = Tag.objects.in_bulk(tag_ids)
+    for tag in tags:
+        if tag not in found:
+            raise serializers.ValidationError(
+                settings.NO_TAG.format(tag=tag))
+    return [found[tag] for tag in tags]
@@ -1,4 +1,4 @@
-from django.db.models import Count, Sum
+from django.db.models import BooleanField, Value
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
@@ -6,51 +6,90 @@ from rest_framework.decorators import action
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
-from rest_framework.filters import SearchFilter
 
+from api.bulk import bulk_favorite_cart, bulk_subscribe
+from api.catalog import CatalogCacheMixin
 from api.filters import RecipeFilter
+from api.indexes import ingredient_index, normalize
+from api.memberships import get_author_ids, get_recipe_ids
+from api.pagination import RecipePagination
 from api.permissions import IsAuthorOrReadOnly
+from api.replicas import ReplicaReadMixin
 from api.serializers import (CartSerializer, FavoriteSerializer,
                              IngredientSerializer, RecipeSerializerRead,
                              RecipeSerializerWrite, SubscribeSerializer,
                              SubscriptionSerializer, TagSerializer)
-from api.utils import (create_favorite_cart, delete_favorite_cart,
-                       generate_cart, get_author)
-from recipes.models import (Cart, Favorite, Recipe, RecipeIngredient,
+from api.utils import (SEARCH_PARAMS, attach_author_recipes,
+                       create_favorite_cart, delete_favorite_cart,
+                       generate_cart, get_author, get_recipes_limit,
+                       get_search_term)
+from recipes.models import (Cart, CartIngredient, Favorite, Recipe,
                             Subscription, Tag, User, Ingredient)
 from djoser.views import UserViewSet as DjoserUserViewSet
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CatalogCacheMixin, ReplicaReadMixin,
+                 viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogCacheMixin, ReplicaReadMixin,
+                        viewsets.ReadOnlyModelViewSet):
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (SearchFilter, )
-    search_fields = ('name', )
     queryset = Ingredient.objects.all()
 
+    def list(self, request, *args, **kwargs):
+        name = get_search_term(request.query_params)
+        if name and name.strip():
+            return Response(ingredient_index.search(name))
+        return super().list(request, *args, **kwargs)
 
-class RecipeViewSet(viewsets.ModelViewSet):
+    def get_cache_variant(self, request, kwargs):
+        if kwargs or set(request.GET) - SEARCH_PARAMS:
+            return None
+        return normalize(get_search_term(request.GET) or '')
+
+    def should_cache(self, request, response):
+        # Пустой результат поиска не кэшируется, поэтому вариантов ключа
+        # не больше, чем подстрок в названиях ингредиентов.
+        return bool(response.data)
+
+
+class RecipeViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     permission_classes = (IsAuthorOrReadOnly, IsAuthenticatedOrReadOnly)
     filterset_class = RecipeFilter
+    pagination_class = RecipePagination
 
     def get_queryset(self):
-        if self.request.user.is_authenticated:
-            return Recipe.custom_objects.add_user_annotations(
-                self.request.user.id).all()
+        if self.request.method == 'GET':
+            return Recipe.custom_objects.add_read_relations(
+                self.request.user.id)
         return Recipe.custom_objects.all()
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if (self.request.method == 'GET'
+                and self.request.user.is_authenticated):
+            context['favorite_ids'] = get_recipe_ids(
+                Favorite, self.request.user.id)
+            context['cart_ids'] = get_recipe_ids(Cart, self.request.user.id)
+        return context
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeSerializerRead
         return RecipeSerializerWrite
 
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= у выгрузки корзины выбирает формат файла, а не рендерер.
+        if self.action == 'download_shopping_cart':
+            force = True
+        return super().perform_content_negotiation(request, force)
+
     @action(detail=True, methods=['POST'],
             permission_classes=[IsAuthorOrReadOnly, IsAuthenticated])
     def favorite(self, request, pk):
@@ -69,28 +108,73 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def delete_shopping_cart(self, request, pk):
         return delete_favorite_cart(Cart, request, pk)
 
+    @action(detail=False, methods=['POST', 'DELETE'], url_path='favorite',
+            permission_classes=[IsAuthorOrReadOnly, IsAuthenticated])
+    def bulk_favorite(self, request):
+        return bulk_favorite_cart(Favorite, request)
+
+    @action(detail=False, methods=['POST', 'DELETE'],
+            url_path='shopping_cart',
+            permission_classes=[IsAuthorOrReadOnly, IsAuthenticated])
+    def bulk_shopping_cart(self, request):
+        return bulk_favorite_cart(Cart, request)
+
+    @action(detail=False, methods=['GET'],
+            permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        recipe_ids = self.paginator.paginate_feed(request, request.user.id)
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes], many=True)
+        return self.paginator.get_paginated_response(serializer.data)
+
     @action(detail=False, methods=['GET'],
             permission_classes=[IsAuthenticated])
     def download_shopping_cart(self, request):
-        queryset_ingredients = RecipeIngredient.objects.filter(
-            recipe__carts__user=request.user).values(
+        queryset_ingredients = CartIngredient.objects.filter(
+            user=request.user).values(
             'ingredient__name',
-            'ingredient__measurement_unit', ).order_by(
-            'ingredient__name').annotate(total=Sum('amount'))
+            'ingredient__measurement_unit',
+            'total').order_by('ingredient__name')
 
-        return generate_cart(queryset_ingredients)
+        return generate_cart(queryset_ingredients,
+                             request.query_params.get('format', 'txt'))
 
 
-class SubscriptionViewSet(viewsets.ReadOnlyModelViewSet):
+class SubscriptionViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = SubscriptionSerializer
     permission_classes = (IsAuthorOrReadOnly, IsAuthenticated)
 
     def get_queryset(self):
-        return User.objects.annotate(recipes_count=Count('recipes')).filter(
-            following__subscriber=self.request.user.id)
+        return User.objects.filter(
+            following__subscriber=self.request.user.id).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()))
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        attach_author_recipes(
+            queryset if page is None else page,
+            get_recipes_limit(self.request)
+        )
+        return page
 
 
 class UserViewSet(DjoserUserViewSet):
+    def get_instance(self):
+        # Пользователь из кэша токенов несет только поля для проверки прав,
+        # профиль для /users/me/ читается одним запросом.
+        user = self.request.user
+        if user.get_deferred_fields():
+            user = User.objects.get(pk=user.pk)
+        return user
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if (self.request.method == 'GET'
+                and self.request.user.is_authenticated):
+            context['author_ids'] = get_author_ids(self.request.user.id)
+        return context
+
     @action(methods=['POST', 'DELETE'],
             detail=False,
             url_path=r'(?P<pk>[^/.]+)/subscribe')
@@ -100,6 +184,11 @@ class UserViewSet(DjoserUserViewSet):
         else:
             return self.delete_subscribe(request)
 
+    @action(methods=['POST', 'DELETE'], detail=False, url_path='subscribe',
+            permission_classes=[IsAuthenticated])
+    def bulk_subscribe(self, request):
+        return bulk_subscribe(request)
+
     def create_subscribe(self, request):
         author_id = get_author(request)
         data = {
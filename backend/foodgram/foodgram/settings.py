@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.InstrumentationMiddleware',
+    'api.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -94,6 +96,30 @@ else:
         }
     }
 
+# Реплики для чтения через запятую: хосты PostgreSQL (host или host:port),
+# для SQLite - пути к копиям файла БД.
+REPLICA_DATABASES = []
+for number, location in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', default='').split(',')), 1):
+    replica = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if 'sqlite' in DB_ENGINE:
+        replica['NAME'] = location.strip()
+    else:
+        host, _, port = location.strip().partition(':')
+        replica.update(HOST=host, PORT=port or replica['PORT'])
+    DATABASES[f'replica{number}'] = replica
+    REPLICA_DATABASES.append(f'replica{number}')
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -119,7 +145,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -165,6 +191,7 @@ DJOSER = {
 
 CORS_ALLOW_ALL_ORIGINS = True
 DATA_DIR = (BASE_DIR / 'static/data/')
+BENCHMARK_BASELINE = (BASE_DIR / 'benchmark_baseline.json')
 
 # Далее вынесены постоянные которые нужны для работы проекта
 # ----------------------------------------------------------------------------
@@ -176,6 +203,34 @@ LENGTH200 = 200
 LENGTH7 = 7
 MINVALUE = 1
 MAXVALUE = 3000
+MAX_PAGE_SIZE = 100
+BULK_MAX_IDS = 100
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000
+CART_CHUNK_SIZE = 500
+CART_FILENAME = 'foodgram_products'
+LOAD_BATCH_SIZE = 1000
+SEED_CHUNK_SIZE = 10000
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+MEMBERSHIP_CACHE_TIMEOUT = 60 * 60
+TOKEN_CACHE_TIMEOUT = 60 * 5
+TOKEN_CACHE_LOCAL_TIMEOUT = 5
+TOKEN_REVOKED_TIMEOUT = 60
+TOKEN_CACHE_SIZE = 10000
+FEED_PUSH_MAX_SUBSCRIBERS = 1000
+FEED_PUSH_MAX_RECIPES = 1000
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', default=5))
+SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', default=100))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', default='russian')
+ASYNC_API = (os.getenv('ASYNC_API', default='False') == 'True')
+ASYNC_API_WORKERS = int(os.getenv('ASYNC_API_WORKERS', default=16))
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+IMAGE_RENDITION_QUALITY = 85
+RECIPE_IMAGE_RENDITIONS = {
+    'thumbnail': ((160, 160), 'JPEG'),
+    'card': ((480, 480), 'JPEG'),
+    'webp': ((480, 480), 'WEBP'),
+}
 # ----------------------------------------------------------------------------
 # Regular expressions
 COLOR_REGEX = r'^#([A-Fa-f0-9]{6}|[A-Fa-f0-9]{3})$'
@@ -195,6 +250,7 @@ NOT_POSITIVE_INTEGER = ('Значение amount для ингредиента {
 DUPLICATE_INGREDIENTS = 'Дублирование ингредиента {ingredient} в запросе!'
 DUPLICATE_TAGS = 'Дублирование тега {tag} в запросе!'
 NO_INGREDIENT = 'Такого ингредиента {ingredient} не существует!'
+NO_TAG = 'Такого тега {tag} не существует!'
 DUPLICATE_FAVORITES = 'Дублирование рецепта {recipe} в избранном!'
 DUPLICATE_SUBSCRIPTION = 'Дублирование подписки на автора {author}!'
 NO_SUBSCRIPTION = ('У пользователя {subscriber} нет подписки '
@@ -203,3 +259,8 @@ SELF_SUBSCRIPTION = ('Попытка самоподписки пользоват
                      'на автора {author}!')
 RECIPE_ALREADY_IN_CART = 'Рецепт {recipe} уже добавлен в корзину'
 NO_RECIPE_FOR_DONWLOAD = 'У вас нет рецептов в корзине'
+NOT_LIST_IDS = ('ids должен быть непустым списком положительных целых '
+                'чисел длиной не больше {limit}!')
+INVALID_CURSOR = 'Некорректный курсор страницы.'
+NOT_CART_FORMAT = ('Формат {file_format} не поддерживается, '
+                   'доступные форматы: {formats}.')
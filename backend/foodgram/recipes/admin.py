@@ -1,10 +1,34 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.files.storage import default_storage
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
 
+from api.carts import recipes_changing
 from recipes.models import (Cart, Favorite, Ingredient, Recipe,
                             RecipeIngredient, Subscription, Tag)
 
 
+class EstimatedCountPaginator(Paginator):
+    # Для больших таблиц без фильтров берем оценку числа строк из
+    # статистики PostgreSQL вместо полного COUNT(*).
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] > settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return int(row[0])
+        return super().count
+
+
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     list_display = (
@@ -32,6 +56,7 @@ class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 5
     min_num = 1
+    autocomplete_fields = ('ingredient',)
 
 
 @admin.register(Recipe)
@@ -50,17 +75,31 @@ class RecipeAdmin(admin.ModelAdmin):
         'pub_date',
         'image_screen',
     )
-    search_fields = ('name', 'author',)
-    list_filter = ('name', 'author', 'tags')
-    readonly_fields = ('favorites_count',)
-
-    @admin.display(description='Счетчик избранных')
-    def favorites_count(self, obj):
-        return obj.favorites.all().count()
+    search_fields = ('name', 'author__username', 'author__email')
+    list_filter = ('tags',)
+    list_select_related = ('author',)
+    autocomplete_fields = ('author', 'tags')
+    readonly_fields = ('favorites_count', 'carts_count')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            'tags', 'ingredients')
+
+    def save_related(self, request, form, formsets, change):
+        # Инлайн сохраняет ингредиенты по одному, а сводки корзин
+        # пересчитываются разом по разнице с прежним составом.
+        with recipes_changing([form.instance.pk]):
+            super().save_related(request, form, formsets, change)
 
     @admin.display(description='Превью рецепта')
     def image_screen(self, obj):
-        return mark_safe(f'<img src={obj.image.url} width="80" height="60">')
+        if not obj.image:
+            return '-'
+        thumbnail = obj.image_renditions.get('thumbnail')
+        url = default_storage.url(thumbnail) if thumbnail else obj.image.url
+        return mark_safe(f'<img src={url} width="80" height="60">')
 
     @admin.display(description='Теги')
     def get_tags(self, obj):
@@ -92,8 +131,24 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
         'amount',
     )
     list_editable = ('amount',)
-    search_fields = ('recipe', 'ingredient',)
-    list_filter = ('recipe', 'ingredient',)
+    search_fields = ('recipe__name', 'ingredient__name',)
+    list_select_related = ('recipe', 'ingredient')
+    raw_id_fields = ('recipe',)
+    autocomplete_fields = ('ingredient',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def save_model(self, request, obj, form, change):
+        with recipes_changing([obj.recipe_id, form.initial.get('recipe')]):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with recipes_changing([obj.recipe_id]):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with recipes_changing(queryset.values_list('recipe_id', flat=True)):
+            super().delete_queryset(request, queryset)
 
 
 @admin.register(Cart)
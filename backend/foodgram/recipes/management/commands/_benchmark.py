@@ -0,0 +1,128 @@
+import random
+from io import StringIO
+from statistics import quantiles
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import SynchronousOnlyOperation
+from django.core.management import call_command
+
+from api.carts import rebuild_cart_summaries
+from api.catalog import bump_catalog_version
+from api.feed import backfill_timeline
+from api.search import update_search_index
+from recipes.models import (Cart, Favorite, Ingredient, Recipe,
+                            RecipeIngredient, Subscription, Tag)
+from users.models import User
+
+WORDS = ('суп', 'борщ', 'салат', 'пирог', 'каша', 'котлеты', 'рагу',
+         'омлет', 'плов', 'блины', 'томат', 'сыр', 'грибы', 'курица',
+         'рыба', 'рис', 'картофель', 'лук', 'чеснок', 'морковь')
+
+
+def split(total, parts):
+    return [total // parts + (index < total % parts)
+            for index in range(parts)]
+
+
+def read_status(response):
+    if response.streaming:
+        # Django 3.2 под ASGI читает потоковый ответ в event loop, и запросы
+        # к БД внутри генератора падают - такой ответ считается ошибкой.
+        try:
+            b''.join(response.streaming_content)
+        except SynchronousOnlyOperation:
+            return 500
+    return response.status_code
+
+
+def summary(latencies, errors, elapsed, queries=None):
+    latencies = sorted(latencies)
+    percentiles = quantiles(latencies, n=100) if len(latencies) > 1 else (
+        latencies * 99)
+    result = {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed if elapsed else 0,
+        'p50': percentiles[49] * 1000,
+        'p95': percentiles[94] * 1000,
+        'p99': percentiles[98] * 1000,
+    }
+    if queries is not None:
+        result['queries'] = sum(queries) / len(queries) if queries else 0
+    return result
+
+
+def ids(model):
+    return list(model._default_manager.order_by('pk').values_list(
+        'pk', flat=True))
+
+
+def populate(seed, users_count, recipes_count, ingredients_count=500,
+             tags_count=5, follows=10, favorites=5):
+    # Модели пишутся пачками в обход сигналов, поэтому счетчики, поисковый
+    # индекс и ленты затем досчитываются отдельно.
+    rng = random.Random(seed)
+    Tag.objects.bulk_create([
+        Tag(name=f'Тег {index}', color=f'#{index:06X}', slug=f'tag-{index}')
+        for index in range(tags_count)])
+    Ingredient.objects.bulk_create([
+        Ingredient(name=f'{rng.choice(WORDS)} {index}',
+                   measurement_unit=rng.choice(('г', 'мл', 'шт')))
+        for index in range(ingredients_count)])
+    password = make_password(None)
+    User.objects.bulk_create([
+        User(username=f'bench{index}', email=f'bench{index}@example.com',
+             first_name='Имя', last_name='Фамилия', password=password)
+        for index in range(users_count)])
+    tag_ids, ingredient_ids, user_ids = ids(Tag), ids(Ingredient), ids(User)
+    Recipe.custom_objects.bulk_create([
+        Recipe(author_id=rng.choice(user_ids),
+               name=f'{rng.choice(WORDS)} {index}',
+               text=' '.join(rng.choices(WORDS, k=20)),
+               cooking_time=rng.randint(1, 120))
+        for index in range(recipes_count)], batch_size=1000)
+    recipe_ids = ids(Recipe)
+    Recipe.tags.through.objects.bulk_create([
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in rng.sample(tag_ids, rng.randint(1, 2))],
+        batch_size=1000)
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                         amount=rng.randint(1, 500))
+        for recipe_id in recipe_ids
+        for ingredient_id in rng.sample(ingredient_ids, rng.randint(3, 8))],
+        batch_size=1000)
+    subscriptions = []
+    for user_id in user_ids:
+        authors = rng.sample(user_ids, min(follows + 1, len(user_ids)))
+        subscriptions.extend([
+            (user_id, author_id)
+            for author_id in authors if author_id != user_id][:follows])
+    Subscription.objects.bulk_create([
+        Subscription(subscriber_id=user_id, author_id=author_id)
+        for user_id, author_id in subscriptions], batch_size=1000)
+    # Вторая половина рецептов остается свободной для сценариев, которые
+    # добавляют рецепт в избранное и корзину и тут же убирают его.
+    half = len(recipe_ids) // 2
+    for model in (Favorite, Cart):
+        model.objects.bulk_create([
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in rng.sample(recipe_ids[:half],
+                                        min(favorites, half))],
+            batch_size=1000)
+    call_command('reconcile_counters', stdout=StringIO())
+    rebuild_cart_summaries(user_ids)
+    update_search_index(recipe_ids)
+    for user_id, author_id in subscriptions:
+        backfill_timeline(user_id, author_id)
+    bump_catalog_version()
+    return {
+        'tags': list(Tag.objects.values_list('slug', flat=True)),
+        'ingredients': list(Ingredient.objects.values_list(
+            'name', flat=True)),
+        'recipes': recipe_ids,
+        'free_recipes': recipe_ids[half:],
+        'users': user_ids,
+    }
@@ -1,32 +1,114 @@
+import json
 import logging
+from csv import reader, writer
+from io import StringIO
+from itertools import islice
+from time import perf_counter
 
-from csv import reader
-
-from django.db import transaction
+from django.db import connection, transaction
 
 logging.basicConfig(level=logging.INFO)
 
+STAGING_TABLE = 'foodgram_load_staging'
+
+
+def read_csv(path, fields):
+    with open(path, encoding='utf-8') as file:
+        for row in reader(file):
+            if row:
+                yield dict(zip(fields, row))
+
+
+def read_json(path, fields):
+    with open(path, encoding='utf-8') as file:
+        for item in json.load(file):
+            yield {field: item[field] for field in fields}
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+def unique_rows(rows, fields):
+    seen = set()
+    for row in rows:
+        key = tuple(row[field] for field in fields)
+        if key not in seen:
+            seen.add(key)
+            yield key
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def bulk_insert(model, fields, batch):
+    model.objects.bulk_create(
+        [model(**dict(zip(fields, row))) for row in batch],
+        ignore_conflicts=True
+    )
+
+
+def copy_insert(model, fields, batch):
+    table = connection.ops.quote_name(model._meta.db_table)
+    # У каждой таблицы своя промежуточная: несколько моделей в одной внешней
+    # транзакции иначе попадут в одну временную таблицу с чужими колонками.
+    staging = connection.ops.quote_name(
+        f'{STAGING_TABLE}_{model._meta.db_table}')
+    columns = ', '.join(
+        connection.ops.quote_name(model._meta.get_field(field).column)
+        for field in fields
+    )
+    buffer = StringIO()
+    writer(buffer).writerows(batch)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMP TABLE IF NOT EXISTS {staging} '
+            f'ON COMMIT DROP AS SELECT {columns} FROM {table} WITH NO DATA'
+        )
+        # Пустое поле в CSV COPY читает как NULL, а пустая строка в файле -
+        # это пустая строка.
+        cursor.copy_expert(
+            f'COPY {staging} ({columns}) FROM STDIN '
+            f'WITH (FORMAT csv, FORCE_NOT_NULL ({columns}))',
+            buffer
+        )
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) '
+            f'SELECT {columns} FROM {staging} ON CONFLICT DO NOTHING'
+        )
+        cursor.execute(f'TRUNCATE {staging}')
+
 
 @transaction.atomic
-def data_creator(filename, model):
-    logging.info('Открываем {}'.format(filename))
-    with open(f'{filename}', encoding='utf-8') as file:
-        cf = reader(file)
-        logging.info('Готовим данные для модели {}'.format(model.__name__))
-        if filename == 'ingredients.csv':
-            for name, measurement_unit in cf:
-                model.objects.get_or_create(
-                    name=name,
-                    measurement_unit=measurement_unit
-                )
-        if filename == 'tags.csv':
-            for name, color, slug in cf:
-                model.objects.get_or_create(
-                    name=name,
-                    color=color,
-                    slug=slug
-                )
-        logging.info('Данные из файла {} успешно загружены в модель {}'.format(
-            filename,
-            model.__name__
+def data_creator(path, model, fields, batch_size, dry_run=False):
+    logging.info('Открываем {}'.format(path))
+    rows = unique_rows(READERS[path.suffix](path, fields), fields)
+    insert = (copy_insert if connection.vendor == 'postgresql'
+              else bulk_insert)
+    logging.info('Готовим данные для модели {}'.format(model.__name__))
+    started = perf_counter()
+    before = model.objects.count()
+    total = 0
+    for batch in batches(rows, batch_size):
+        total += len(batch)
+        if not dry_run:
+            insert(model, fields, batch)
+    created = model.objects.count() - before
+    elapsed = perf_counter() - started
+    logging.info(
+        'Файл {}: уникальных строк {}, новых записей {} модели {}, '
+        '{:.0f} строк/с{}'.format(
+            path.name, total, created, model.__name__,
+            total / elapsed if elapsed else total,
+            ' (пробный запуск, данные не записаны)' if dry_run else ''
         ))
+    return created
@@ -0,0 +1,219 @@
+import json
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_databases, teardown_databases
+from rest_framework.authtoken.models import Token
+
+from ._benchmark import WORDS, populate, read_status, split, summary
+
+METRICS = ('rps', 'p50', 'p95', 'p99', 'queries', 'errors')
+
+
+def recipes_list(data, rng):
+    # Первые десять страниц, но не дальше последней на маленьких данных.
+    pages = -(-len(data['recipes']) // settings.REST_FRAMEWORK['PAGE_SIZE'])
+    page = rng.randint(1, min(10, max(1, pages)))
+    return [('get', f'/api/recipes/?page={page}')]
+
+
+def recipes_filtered(data, rng):
+    return [('get', f'/api/recipes/?tags={rng.choice(data["tags"])}'
+                    f'&is_favorited=1')]
+
+
+def recipe_detail(data, rng):
+    return [('get', f'/api/recipes/{rng.choice(data["recipes"])}/')]
+
+
+def recipe_search(data, rng):
+    return [('get', f'/api/recipes/?search={quote(rng.choice(WORDS))}')]
+
+
+def recipe_feed(data, rng):
+    return [('get', '/api/recipes/feed/')]
+
+
+def favorite_toggle(data, rng):
+    url = f'/api/recipes/{rng.choice(data["free_recipes"])}/favorite/'
+    return [('post', url), ('delete', url)]
+
+
+def cart_toggle(data, rng):
+    url = f'/api/recipes/{rng.choice(data["free_recipes"])}/shopping_cart/'
+    return [('post', url), ('delete', url)]
+
+
+def subscriptions(data, rng):
+    return [('get', '/api/users/subscriptions/?recipes_limit=3')]
+
+
+def download_cart(data, rng):
+    return [('get', '/api/recipes/download_shopping_cart/')]
+
+
+def ingredient_search(data, rng):
+    return [('get', '/api/ingredients/?name='
+                    f'{quote(rng.choice(data["ingredients"])[:3])}')]
+
+
+SCENARIOS = {scenario.__name__: scenario for scenario in (
+    recipes_list, recipes_filtered, recipe_detail, recipe_search,
+    recipe_feed, favorite_toggle, cart_toggle, subscriptions, download_cart,
+    ingredient_search,
+)}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def run_scenario(scenario, data, tokens, requests, seed):
+    latencies = []
+    queries = []
+    errors = 0
+    lock = threading.Lock()
+
+    def client_loop(index, count):
+        nonlocal errors
+        client = Client(raise_request_exception=False)
+        rng = random.Random(f'{seed}:{scenario}:{index}')
+        counter = QueryCounter()
+        try:
+            with connection.execute_wrapper(counter):
+                for _ in range(count):
+                    for method, url in SCENARIOS[scenario](data, rng):
+                        counter.count = 0
+                        start = time.perf_counter()
+                        status = read_status(getattr(client, method)(
+                            url, HTTP_AUTHORIZATION=f'Token {tokens[index]}'))
+                        with lock:
+                            latencies.append(time.perf_counter() - start)
+                            queries.append(counter.count)
+                            errors += status >= 400
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(tokens)) as clients:
+        for future in [clients.submit(client_loop, index, count)
+                       for index, count in enumerate(
+                           split(requests, len(tokens)))]:
+            future.result()
+    return summary(latencies, errors, time.perf_counter() - start, queries)
+
+
+def compare(value, baseline):
+    if not baseline:
+        return ''
+    return f' ({(value - baseline) / baseline:+.0%})'
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон API на отдельной тестовой БД: пропускная '
+            'способность, задержки p50/p95/p99 и запросы к БД на запрос.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            choices=SCENARIOS, help='Сценарий, по умолчанию все.')
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Количество итераций каждого сценария.')
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Количество одновременных клиентов.')
+        parser.add_argument(
+            '--users', type=int, default=100,
+            help='Количество пользователей в тестовых данных.')
+        parser.add_argument(
+            '--recipes', type=int, default=2000,
+            help='Количество рецептов в тестовых данных.')
+        parser.add_argument(
+            '--seed', type=int, default=1,
+            help='Зерно генератора тестовых данных и запросов.')
+        parser.add_argument(
+            '--baseline', default=settings.BENCHMARK_BASELINE,
+            help='JSON с эталонными результатами для сравнения.')
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Записать результаты прогона как новый эталон.')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, min(options['concurrency'], options['users']))
+        workdir = None
+        if connection.vendor == 'sqlite':
+            # Тестовая SQLite в памяти не переживает работу из нескольких
+            # потоков, поэтому прогон идет на временном файле.
+            workdir = tempfile.mkdtemp()
+            connection.settings_dict['TEST']['NAME'] = str(
+                Path(workdir) / 'benchmark.sqlite3')
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = self.run(options, concurrency)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            if workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+        self.report(results, options)
+
+    def run(self, options, concurrency):
+        data = populate(options['seed'], options['users'],
+                        options['recipes'])
+        tokens = [Token.objects.create(user_id=user_id).key
+                  for user_id in data['users'][:concurrency]]
+        results = {}
+        for scenario in options['scenarios'] or SCENARIOS:
+            run_scenario(scenario, data, tokens[:1], 1, options['seed'])
+            results[scenario] = {
+                metric: round(value, 2) for metric, value in run_scenario(
+                    scenario, data, tokens, options['requests'],
+                    options['seed']).items()
+                if metric in METRICS}
+        return {
+            'settings': {
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'concurrency': concurrency,
+                'users': options['users'],
+                'recipes': options['recipes'],
+                'seed': options['seed'],
+            },
+            'scenarios': results,
+        }
+
+    def report(self, results, options):
+        path = Path(options['baseline'])
+        baseline = {}
+        if path.exists():
+            baseline = json.loads(path.read_text()).get('scenarios', {})
+        for scenario, result in results['scenarios'].items():
+            base = baseline.get(scenario, {})
+            self.stdout.write(
+                f'{scenario:<18} {result["rps"]:8.1f} req/s'
+                f'{compare(result["rps"], base.get("rps"))}  '
+                f'p50 {result["p50"]:.1f}  p95 {result["p95"]:.1f}  '
+                f'p99 {result["p99"]:.1f} ms'
+                f'{compare(result["p99"], base.get("p99"))}  '
+                f'запросов {result["queries"]:.1f}'
+                f'{compare(result["queries"], base.get("queries"))}  '
+                f'ошибок {result["errors"]}')
+        if options['save']:
+            path.write_text(json.dumps(results, indent=2, sort_keys=True,
+                                       ensure_ascii=False) + '\n')
+            self.stdout.write(f'Эталон записан в {path}')
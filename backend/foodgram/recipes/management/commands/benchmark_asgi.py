@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+
+from django.core.management import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import include, path
+from rest_framework.authtoken.models import Token
+
+from api.async_views import async_patterns
+from api.urls import ASYNC_VIEWSETS, router_v1
+from recipes.models import Recipe
+from users.models import User
+
+from ._benchmark import read_status, split, summary
+
+MODES = ('wsgi', 'asgi', 'asgi-async')
+
+
+def make_urlconf(name, patterns):
+    urlconf = ModuleType(name)
+    urlconf.urlpatterns = [path('api/', include(patterns))]
+    return urlconf
+
+
+def default_paths():
+    recipe = Recipe.custom_objects.order_by('pk').first()
+    paths = ['/api/recipes/', '/api/tags/', '/api/ingredients/?name=а',
+             '/api/users/subscriptions/',
+             '/api/recipes/download_shopping_cart/']
+    if recipe is not None:
+        paths.insert(1, f'/api/recipes/{recipe.pk}/')
+    return paths
+
+
+def run_wsgi(url, token, requests, concurrency, threads):
+    local = threading.local()
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def handle():
+        if not hasattr(local, 'client'):
+            local.client = Client(raise_request_exception=False)
+        response = local.client.get(
+            url, HTTP_AUTHORIZATION=f'Token {token}')
+        return read_status(response)
+
+    def client_loop(count):
+        nonlocal errors
+        for _ in range(count):
+            start = time.perf_counter()
+            status = workers.submit(handle).result()
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                errors += status >= 400
+
+    with ThreadPoolExecutor(max_workers=threads) as workers:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as clients:
+            for count in split(requests, concurrency):
+                clients.submit(client_loop, count)
+        elapsed = time.perf_counter() - start
+    return summary(latencies, errors, elapsed)
+
+
+def run_asgi(url, token, requests, concurrency):
+    latencies = []
+    errors = 0
+
+    async def client_loop(count):
+        nonlocal errors
+        client = AsyncClient(raise_request_exception=False)
+        for _ in range(count):
+            start = time.perf_counter()
+            response = await client.get(url, authorization=f'Token {token}')
+            status = read_status(response)
+            latencies.append(time.perf_counter() - start)
+            errors += status >= 400
+
+    async def main():
+        await asyncio.gather(*(client_loop(count)
+                               for count in split(requests, concurrency)))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return summary(latencies, errors, time.perf_counter() - start)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность API под WSGI и ASGI, '
+            'в том числе с асинхронными представлениями (ASYNC_API).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Адрес для нагрузки, можно указать несколько раз.')
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Количество запросов на каждый адрес в каждом режиме.')
+        parser.add_argument(
+            '--concurrency', type=int, default=20,
+            help='Количество одновременных клиентов.')
+        parser.add_argument(
+            '--threads', type=int, default=1,
+            help='Количество потоков WSGI-воркера.')
+        parser.add_argument(
+            '--user', help='Пользователь, от имени которого идут запросы.')
+        parser.add_argument(
+            '--mode', choices=MODES, action='append', dest='modes',
+            help='Режим запуска, по умолчанию все.')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(username=options['user'])
+        user = users.first()
+        if user is None:
+            raise CommandError('Нет пользователя для запросов.')
+        token, _ = Token.objects.get_or_create(user=user)
+        concurrency = max(1, options['concurrency'])
+        sync_urlconf = make_urlconf('benchmark_sync_urls', router_v1.urls)
+        urlconfs = {
+            'wsgi': sync_urlconf,
+            'asgi': sync_urlconf,
+            'asgi-async': make_urlconf(
+                'benchmark_async_urls',
+                async_patterns(router_v1.urls, ASYNC_VIEWSETS)),
+        }
+        for url in options['paths'] or default_paths():
+            self.stdout.write(url)
+            for mode in options['modes'] or MODES:
+                with override_settings(ROOT_URLCONF=urlconfs[mode]):
+                    if mode == 'wsgi':
+                        result = run_wsgi(url, token.key,
+                                          options['requests'], concurrency,
+                                          max(1, options['threads']))
+                    else:
+                        result = run_asgi(url, token.key,
+                                          options['requests'], concurrency)
+                self.stdout.write(
+                    f'  {mode:<10} {result["rps"]:8.1f} req/s  '
+                    f'p50 {result["p50"]:7.1f} ms  '
+                    f'p95 {result["p95"]:7.1f} ms  '
+                    f'p99 {result["p99"]:7.1f} ms  '
+                    f'ошибок {result["errors"]}')
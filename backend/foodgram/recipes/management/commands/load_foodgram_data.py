@@ -1,20 +1,50 @@
-import os
+from pathlib import Path
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
 
+from api.catalog import schedule_catalog_bump
 from recipes.models import Ingredient, Tag
 
-from ._db_load import data_creator
+from ._db_load import READERS, data_creator
 
-DATA_TO_MODEL_MAPPING = (
-    ('ingredients.csv', Ingredient,),
-    ('tags.csv', Tag,),
-)
+DATA_TO_MODEL_MAPPING = {
+    'ingredients': (Ingredient, ('name', 'measurement_unit')),
+    'tags': (Tag, ('name', 'color', 'slug')),
+}
+DEFAULT_FILES = ('ingredients.csv', 'tags.csv')
 
 
 class Command(BaseCommand):
+    help = ('Загружает ингредиенты и теги из CSV или JSON файлов. '
+            'Повторная загрузка пропускает уже существующие записи.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='*',
+            help='Файлы ingredients.* и tags.* (csv или json). '
+                 'По умолчанию берутся файлы из DATA_DIR.')
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.LOAD_BATCH_SIZE,
+            help='Количество строк в одной пачке вставки.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Прочитать файлы и посчитать строки без записи в БД.')
+
     def handle(self, *args, **options):
-        os.chdir(settings.DATA_DIR)
-        for filename, model in DATA_TO_MODEL_MAPPING:
-            data_creator(filename, model)
+        paths = ([Path(filename) for filename in options['files']]
+                 or [settings.DATA_DIR / name for name in DEFAULT_FILES])
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        for path in paths:
+            if path.stem not in DATA_TO_MODEL_MAPPING:
+                raise CommandError(f'Неизвестный набор данных: {path.name}')
+            if path.suffix not in READERS:
+                raise CommandError(f'Неподдерживаемый формат: {path.name}')
+        for path in paths:
+            model, fields = DATA_TO_MODEL_MAPPING[path.stem]
+            created = data_creator(path, model, fields,
+                                   options['batch_size'],
+                                   options['dry_run'])
+            if created:
+                schedule_catalog_bump()
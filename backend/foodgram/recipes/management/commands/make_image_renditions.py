@@ -0,0 +1,20 @@
+from django.core.management import BaseCommand
+
+from api.images import make_renditions, needs_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Создает уменьшенные копии картинок рецептов, '
+            'для которых их еще нет.')
+
+    def handle(self, *args, **options):
+        created = 0
+        recipes = Recipe.custom_objects.only(
+            'image', 'image_renditions').exclude(image='').exclude(
+            image__isnull=True).order_by('pk')
+        for recipe in recipes.iterator():
+            if needs_renditions(recipe):
+                make_renditions(recipe.pk)
+                created += 1
+        self.stdout.write(f'Обработано картинок: {created}')
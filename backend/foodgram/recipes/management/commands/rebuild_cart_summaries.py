@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from api.carts import rebuild_cart_summaries
+from recipes.models import Cart, CartIngredient
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает сводки корзин из состава рецептов в корзинах, '
+            'например после записи в обход сигналов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.LOAD_BATCH_SIZE,
+            help='Количество пользователей, пересчитываемых за транзакцию.')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(
+            Exists(Cart.objects.filter(user_id=OuterRef('pk')))
+            | Exists(CartIngredient.objects.filter(user_id=OuterRef('pk'))))
+        rebuilt = 0
+        last_pk = 0
+        while True:
+            pks = list(users.filter(pk__gt=last_pk).order_by(
+                'pk').values_list('pk', flat=True)[:options['batch_size']])
+            if not pks:
+                break
+            last_pk = pks[-1]
+            rebuild_cart_summaries(pks)
+            rebuilt += len(pks)
+        self.stdout.write(f'Пересчитано сводок корзин: {rebuilt}')
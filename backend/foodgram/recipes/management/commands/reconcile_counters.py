@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db.models import Q
+
+from recipes.models import Cart, Favorite, Recipe, count_related
+from users.models import User
+
+
+def reconcile(queryset, counters, batch_size):
+    fixed = 0
+    last_pk = 0
+    while True:
+        pks = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list(
+            'pk', flat=True)[:batch_size])
+        if not pks:
+            return fixed
+        last_pk = pks[-1]
+        drift = Q()
+        for field, expression in counters.items():
+            drift |= ~Q(**{field: expression})
+        fixed += queryset.filter(pk__in=pks).filter(drift).update(**counters)
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счетчики избранного, корзин и рецептов '
+            'и исправляет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.LOAD_BATCH_SIZE,
+            help='Количество записей, проверяемых за один запрос.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fixed_recipes = reconcile(Recipe.custom_objects.all(), {
+            'favorites_count': count_related(Favorite, 'recipe'),
+            'carts_count': count_related(Cart, 'recipe'),
+        }, batch_size)
+        fixed_users = reconcile(User.objects.all(), {
+            'recipes_count': count_related(Recipe, 'author'),
+        }, batch_size)
+        self.stdout.write(f'Исправлено рецептов: {fixed_recipes}, '
+                          f'пользователей: {fixed_users}')
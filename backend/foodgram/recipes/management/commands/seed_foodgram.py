@@ -0,0 +1,380 @@
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from csv import writer
+from datetime import timedelta
+from functools import lru_cache
+from io import StringIO
+from itertools import accumulate
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from api.carts import rebuild_cart_summaries
+from api.catalog import bump_catalog_version
+from api.search import update_search_index
+from recipes.models import (Cart, Favorite, FeedEntry, Ingredient, Recipe,
+                            RecipeIngredient, Subscription, Tag,
+                            count_related)
+from users.models import User
+
+from ._benchmark import WORDS, ids
+from .reconcile_counters import reconcile
+
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Петр', 'Елена', 'Сергей', 'Ольга',
+               'Дмитрий', 'Наталья', 'Алексей')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев',
+              'Петров', 'Соколов', 'Михайлов', 'Новиков', 'Федоров')
+AMOUNTS = (1, 2, 3, 5, 10, 50, 100, 150, 200, 250, 300, 500)
+UNITS = ('г', 'мл', 'шт', 'ст. л.', 'ч. л.', 'по вкусу')
+
+
+@lru_cache(maxsize=None)
+def zipf_weights(size, exponent):
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, size + 1)))
+
+
+def zipf_sample(rng, size, exponent, count, exclude=None):
+    # Несколько различных индексов 0..size-1, где индекс k выпадает
+    # с вероятностью ~ 1 / (k + 1) ** exponent: популярные авторы,
+    # рецепты и продукты встречаются заметно чаще остальных.
+    if count <= 0 or size <= 0:
+        return []
+    picks = dict.fromkeys(rng.choices(
+        range(size), cum_weights=zipf_weights(size, exponent), k=count * 2))
+    picks.pop(exclude, None)
+    return list(picks)[:count]
+
+
+def activity(rng, mean, limit):
+    # Распределение Парето с alpha=1.5 (среднее 3): большинство
+    # пользователей почти неактивны, немногие делают очень много.
+    return min(limit, int(mean * rng.paretovariate(1.5) / 3))
+
+
+def columns(model, *fields):
+    return model._meta.db_table, [
+        model._meta.get_field(field).column for field in fields]
+
+
+def write_rows(model, fields, rows):
+    if not rows:
+        return 0
+    table, names = columns(model, *fields)
+    table = connection.ops.quote_name(table)
+    names = ', '.join(connection.ops.quote_name(name) for name in names)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            buffer = StringIO()
+            writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert(
+                f'COPY {table} ({names}) FROM STDIN WITH (FORMAT csv)',
+                buffer)
+        else:
+            placeholders = ', '.join(['%s'] * len(fields))
+            cursor.executemany(
+                f'INSERT INTO {table} ({names}) VALUES ({placeholders})',
+                rows)
+    return len(rows)
+
+
+def moment(plan, index, total):
+    # Даты растут вместе с первичным ключом и равномерно покрывают
+    # последние plan['days'] дней.
+    return connection.ops.adapt_datetimefield_value(
+        plan['end'] - timedelta(days=plan['days'] * (total - index) / total))
+
+
+def seed_users(plan, rng, start, count):
+    rows = []
+    for index in range(start, start + count):
+        pk = plan['first_user'] + index
+        rows.append((
+            pk, f'seed{pk}', f'seed{pk}@example.com',
+            rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+            plan['password'], False, False, True,
+            moment(plan, index, plan['users']), 0, False))
+    return write_rows(User, (
+        'id', 'username', 'email', 'first_name', 'last_name', 'password',
+        'is_superuser', 'is_staff', 'is_active', 'date_joined',
+        'recipes_count', 'feed_on_read'), rows)
+
+
+def seed_recipes(plan, rng, start, count):
+    recipes = []
+    tags = []
+    ingredients = []
+    tag_ids = plan['tag_ids']
+    ingredient_ids = plan['ingredient_ids']
+    for index in range(start, start + count):
+        pk = plan['first_recipe'] + index
+        words = rng.sample(WORDS, 2)
+        recipes.append((
+            pk,
+            plan['first_user'] + zipf_sample(
+                rng, plan['users'], plan['exponent'], 1)[0],
+            f'{words[0].capitalize()} {words[1]} №{pk}',
+            ' '.join(rng.choices(WORDS, k=rng.randint(10, 60))),
+            max(settings.MINVALUE, min(300, int(rng.lognormvariate(3.4,
+                                                                   0.6)))),
+            moment(plan, index, plan['recipes']), '{}', 0, 0))
+        tags.extend(
+            (pk, tag_ids[position]) for position in zipf_sample(
+                rng, len(tag_ids), plan['exponent'], rng.randint(1, 3)))
+        ingredients.extend(
+            (pk, ingredient_ids[position], rng.choice(AMOUNTS))
+            for position in zipf_sample(
+                rng, len(ingredient_ids), plan['exponent'],
+                rng.randint(3, 12)))
+    return (
+        write_rows(Recipe, (
+            'id', 'author', 'name', 'text', 'cooking_time', 'pub_date',
+            'image_renditions', 'favorites_count', 'carts_count'), recipes)
+        + write_rows(Recipe.tags.through, ('recipe', 'tag'), tags)
+        + write_rows(RecipeIngredient, ('recipe', 'ingredient', 'amount'),
+                     ingredients))
+
+
+def seed_activity(plan, rng, start, count):
+    subscriptions = []
+    favorites = []
+    carts = []
+    users = plan['users']
+    recipes = plan['recipes']
+    exponent = plan['exponent']
+    for index in range(start, start + count):
+        pk = plan['first_user'] + index
+        subscriptions.extend(
+            (pk, plan['first_user'] + position) for position in zipf_sample(
+                rng, users, exponent,
+                activity(rng, plan['follows'], users - 1), exclude=index))
+        for rows, mean in ((favorites, plan['favorites']),
+                           (carts, plan['carts'])):
+            rows.extend(
+                (pk, plan['first_recipe'] + position)
+                for position in zipf_sample(
+                    rng, recipes, exponent, activity(rng, mean, recipes)))
+    return (
+        write_rows(Subscription, ('subscriber', 'author'), subscriptions)
+        + write_rows(Favorite, ('user', 'recipe'), favorites)
+        + write_rows(Cart, ('user', 'recipe'), carts))
+
+
+def seed_counters(plan, rng, start, count):
+    recipes = Recipe.custom_objects.filter(pk__range=(
+        plan['first_recipe'] + start,
+        plan['first_recipe'] + start + count - 1))
+    users = User.objects.filter(pk__range=(
+        plan['first_user'] + start, plan['first_user'] + start + count - 1))
+    rebuild_cart_summaries(users.values('pk'))
+    return reconcile(recipes, {
+        'favorites_count': count_related(Favorite, 'recipe'),
+        'carts_count': count_related(Cart, 'recipe'),
+    }, count) + reconcile(users, {
+        'recipes_count': count_related(Recipe, 'author'),
+    }, count)
+
+
+def seed_search(plan, rng, start, count):
+    first = plan['first_recipe'] + start
+    update_search_index(range(first, min(
+        first + count, plan['first_recipe'] + plan['recipes'])))
+    return min(count, plan['recipes'] - start)
+
+
+def seed_timelines(plan, rng, start, count):
+    # Ленты заполняются одним INSERT ... SELECT на пачку подписчиков:
+    # построчный backfill_timeline на миллионах подписок слишком медленный.
+    first = plan['first_user'] + start
+    feed, (user, recipe, pub_date) = columns(
+        FeedEntry, 'user', 'recipe', 'pub_date')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {feed} ({user}, {recipe}, {pub_date}) '
+            f'SELECT s.subscriber_id, r.id, r.pub_date '
+            f'FROM {Subscription._meta.db_table} s '
+            f'JOIN {User._meta.db_table} u ON u.id = s.author_id '
+            f'JOIN {Recipe._meta.db_table} r ON r.author_id = s.author_id '
+            f'WHERE u.feed_on_read = %s '
+            f'AND s.subscriber_id BETWEEN %s AND %s',
+            (False, first, first + count - 1))
+        return cursor.rowcount
+
+
+STAGES = {
+    'users': seed_users,
+    'recipes': seed_recipes,
+    'activity': seed_activity,
+    'counters': seed_counters,
+    'search': seed_search,
+    'timelines': seed_timelines,
+}
+
+
+def run_chunk(stage, plan, start, count):
+    # Генератор пачки зависит только от зерна, этапа и начала пачки,
+    # поэтому результат не зависит от числа процессов и порядка их работы.
+    rng = random.Random(f'{plan["seed"]}:{stage}:{start}')
+    with transaction.atomic():
+        return STAGES[stage](plan, rng, start, count)
+
+
+class Command(BaseCommand):
+    help = ('Генерирует синтетические данные производственного объема: '
+            'пользователей, рецепты, подписки, избранное и корзины '
+            'с неравномерным (Zipf) распределением популярности.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=10000,
+            help='Количество пользователей.')
+        parser.add_argument(
+            '--recipes', type=int, default=100000,
+            help='Количество рецептов.')
+        parser.add_argument(
+            '--ingredients', type=int, default=2000,
+            help='Минимальное количество ингредиентов в справочнике.')
+        parser.add_argument(
+            '--tags', type=int, default=10,
+            help='Минимальное количество тегов.')
+        parser.add_argument(
+            '--follows', type=float, default=20,
+            help='Среднее число подписок пользователя.')
+        parser.add_argument(
+            '--favorites', type=float, default=10,
+            help='Среднее число избранных рецептов пользователя.')
+        parser.add_argument(
+            '--carts', type=float, default=3,
+            help='Среднее число рецептов в корзине пользователя.')
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help='Показатель распределения Zipf для популярности.')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней публикуются рецепты.')
+        parser.add_argument(
+            '--password',
+            help='Пароль всех пользователей, по умолчанию вход невозможен.')
+        parser.add_argument(
+            '--seed', type=int, default=1,
+            help='Зерно генератора: одинаковые параметры дают одинаковые '
+                 'данные.')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Количество параллельных процессов (только PostgreSQL).')
+
+    def handle(self, *args, **options):
+        if options['recipes'] and options['users'] < 1:
+            raise CommandError('Рецептам нужен хотя бы один автор.')
+        workers = max(1, options['workers'] or 1)
+        if connection.vendor != 'postgresql':
+            # SQLite допускает только одного пишущего.
+            workers = 1
+        plan = self.plan(options)
+        pool = None
+        if workers > 1:
+            connections.close_all()
+            pool = ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context('fork'))
+        try:
+            self.stage(pool, 'users', plan, plan['users'])
+            self.stage(pool, 'recipes', plan, plan['recipes'])
+            self.stage(pool, 'activity', plan, plan['users'])
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    for sql in connection.ops.sequence_reset_sql(
+                            no_style(), [User, Recipe]):
+                        cursor.execute(sql)
+            self.stage(pool, 'counters', plan,
+                       max(plan['users'], plan['recipes']))
+            self.stage(pool, 'search', plan, plan['recipes'])
+            self.mark_feed_on_read(plan)
+            self.stage(pool, 'timelines', plan, plan['users'])
+        finally:
+            if pool:
+                pool.shutdown()
+
+    def plan(self, options):
+        created = self.ensure_catalog(options['tags'],
+                                      options['ingredients'])
+        if created:
+            bump_catalog_version()
+        tag_ids = ids(Tag)
+        ingredient_ids = ids(Ingredient)
+        if options['recipes'] and not (tag_ids and ingredient_ids):
+            raise CommandError('Нужны хотя бы один тег и один ингредиент.')
+        zipf_weights(options['users'], options['exponent'])
+        zipf_weights(options['recipes'], options['exponent'])
+        return {
+            'seed': options['seed'],
+            'exponent': options['exponent'],
+            'users': options['users'],
+            'recipes': options['recipes'],
+            'follows': options['follows'],
+            'favorites': options['favorites'],
+            'carts': options['carts'],
+            'days': options['days'],
+            'first_user': (User.objects.aggregate(
+                last=Max('pk'))['last'] or 0) + 1,
+            'first_recipe': (Recipe.custom_objects.aggregate(
+                last=Max('pk'))['last'] or 0) + 1,
+            'tag_ids': tag_ids,
+            'ingredient_ids': ingredient_ids,
+            'password': make_password(options['password']),
+            # Даты отсчитываются от начала суток, чтобы повторный запуск
+            # в тот же день давал те же данные.
+            'end': timezone.now().replace(
+                hour=0, minute=0, second=0, microsecond=0),
+        }
+
+    def ensure_catalog(self, tags_count, ingredients_count):
+        rng = random.Random('catalog')
+        before = Tag.objects.count() + Ingredient.objects.count()
+        Tag.objects.bulk_create([
+            Tag(name=f'Тег {index}', color=f'#{rng.randrange(1 << 24):06X}',
+                slug=f'seed-{index}')
+            for index in range(max(0, tags_count - Tag.objects.count()))
+        ], ignore_conflicts=True)
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'{rng.choice(WORDS)} {index}',
+                       measurement_unit=rng.choice(UNITS))
+            for index in range(
+                max(0, ingredients_count - Ingredient.objects.count()))
+        ], batch_size=settings.LOAD_BATCH_SIZE, ignore_conflicts=True)
+        return Tag.objects.count() + Ingredient.objects.count() - before
+
+    def mark_feed_on_read(self, plan):
+        # Рецепты популярных и плодовитых авторов подмешиваются в ленту
+        # при чтении, как и в api.feed.feed_on_read.
+        User.objects.filter(pk__in=User.objects.filter(
+            pk__gte=plan['first_user']
+        ).annotate(subscribers=Count('following')).filter(
+            Q(subscribers__gt=settings.FEED_PUSH_MAX_SUBSCRIBERS)
+            | Q(recipes_count__gt=settings.FEED_PUSH_MAX_RECIPES)
+        ).values('pk')).update(feed_on_read=True)
+
+    def stage(self, pool, stage, plan, total):
+        started = perf_counter()
+        chunks = [(start, min(settings.SEED_CHUNK_SIZE, total - start))
+                  for start in range(0, total, settings.SEED_CHUNK_SIZE)]
+        if not chunks:
+            return
+        if pool:
+            rows = sum(pool.map(run_chunk, *zip(*[
+                (stage, plan, start, count) for start, count in chunks])))
+        else:
+            rows = sum(run_chunk(stage, plan, start, count)
+                       for start, count in chunks)
+        elapsed = perf_counter() - started
+        self.stdout.write(
+            f'{stage}: {rows} строк за {elapsed:.1f} с '
+            f'({rows / elapsed if elapsed else rows:.0f} строк/с)')
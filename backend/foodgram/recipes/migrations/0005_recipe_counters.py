@@ -0,0 +1,49 @@
+# Generated by Django 3.2 on 2026-10-18 19:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_related(model, field):
+    return Coalesce(
+        Subquery(
+            model._default_manager.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(total=Count('pk')).values('total')
+        ),
+        0
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    Cart = apps.get_model('recipes', 'Cart')
+    User = apps.get_model('users', 'User')
+    Recipe._default_manager.update(
+        favorites_count=count_related(Favorite, 'recipe'),
+        carts_count=count_related(Cart, 'recipe'),
+    )
+    User._default_manager.update(recipes_count=count_related(Recipe, 'author'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_image_renditions'),
+        ('users', '0002_user_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Счетчик корзин'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Счетчик избранных'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+# Конфигурация зафиксирована, чтобы результат миграции не зависел от
+# окружения. При другом SEARCH_CONFIG индекс пересчитывается через
+# api.search.update_search_index.
+SEARCH_CONFIG = 'russian'
+
+INGREDIENT_NAMES = (
+    "COALESCE((SELECT {aggregate} FROM recipes_recipeingredient ri "
+    "JOIN recipes_ingredient i ON i.id = ri.ingredient_id "
+    "WHERE ri.recipe_id = r.id), '')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector')
+        schema_editor.execute(
+            'CREATE INDEX recipes_recipe_search_idx ON recipes_recipe '
+            'USING gin (search_vector)')
+        names = INGREDIENT_NAMES.format(aggregate="string_agg(i.name, ' ')")
+        schema_editor.execute(
+            'UPDATE recipes_recipe AS r SET search_vector = '
+            "setweight(to_tsvector(%s, r.name), 'A') || "
+            f"setweight(to_tsvector(%s, {names}), 'B') || "
+            "setweight(to_tsvector(%s, r.text), 'C')",
+            [SEARCH_CONFIG] * 3)
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5('
+            "name, ingredients, text, tokenize = 'unicode61 remove_diacritics 2')")
+        names = INGREDIENT_NAMES.format(aggregate="group_concat(i.name, ' ')")
+        schema_editor.execute(
+            'INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text) '
+            f'SELECT r.id, r.name, {names}, r.text FROM recipes_recipe r')
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX recipes_recipe_search_idx')
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe DROP COLUMN search_vector')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE recipes_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 3.2 on 2026-10-18 19:09
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def fill_timelines(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Subscription = apps.get_model('recipes', 'Subscription')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    User._default_manager.filter(pk__in=User._default_manager.annotate(
+        subscribers=Count('following')
+    ).filter(
+        Q(subscribers__gt=settings.FEED_PUSH_MAX_SUBSCRIBERS)
+        | Q(recipes_count__gt=settings.FEED_PUSH_MAX_RECIPES)
+    ).values('pk')).update(feed_on_read=True)
+    rows = Subscription._default_manager.filter(
+        author__feed_on_read=False
+    ).values_list('subscriber_id', 'author__recipes__id',
+                  'author__recipes__pub_date').exclude(
+        author__recipes__id=None).iterator()
+    entries = []
+    for user_id, recipe_id, pub_date in rows:
+        entries.append(FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                                 pub_date=pub_date))
+        if len(entries) == settings.LOAD_BATCH_SIZE:
+            FeedEntry._default_manager.bulk_create(
+                entries, ignore_conflicts=True)
+            entries = []
+    FeedEntry._default_manager.bulk_create(entries, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0006_recipe_search'),
+        ('users', '0003_user_feed_on_read'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', 'pub_date', 'id'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Читатель ленты'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
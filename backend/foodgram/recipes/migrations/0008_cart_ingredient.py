@@ -0,0 +1,53 @@
+# Generated by Django 3.2 on 2026-10-18 19:24
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def fill_cart_summaries(apps, schema_editor):
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    CartIngredient = apps.get_model('recipes', 'CartIngredient')
+    rows = RecipeIngredient._default_manager.exclude(
+        recipe__carts=None
+    ).values_list('recipe__carts__user_id', 'ingredient_id').annotate(
+        total=Sum('amount')).order_by().iterator()
+    entries = []
+    for user_id, ingredient_id, total in rows:
+        entries.append(CartIngredient(user_id=user_id,
+                                      ingredient_id=ingredient_id,
+                                      total=total))
+        if len(entries) == settings.LOAD_BATCH_SIZE:
+            CartIngredient._default_manager.bulk_create(entries)
+            entries = []
+    CartIngredient._default_manager.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0007_feed_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_ingredients', to='recipes.ingredient', verbose_name='Продукт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Продукт корзины',
+                'verbose_name_plural': 'Продукты корзины',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cartingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_cart_ingredient'),
+        ),
+        migrations.RunPython(fill_cart_summaries, migrations.RunPython.noop),
+    ]
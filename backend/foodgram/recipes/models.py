@@ -3,7 +3,9 @@ from django.conf import settings
 from django.core import validators
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
-from django.db.models import Exists, OuterRef, UniqueConstraint
+from django.db.models import (Count, Exists, F, OuterRef, Prefetch,
+                              Subquery, UniqueConstraint, Window)
+from django.db.models.functions import Coalesce, RowNumber
 
 from users.models import User
 
@@ -70,21 +72,55 @@ class Tag(models.Model):
 
 class RecipeQuerySet(models.QuerySet):
 
-    def add_user_annotations(self, user_id):
-        return self.annotate(
-            is_favorited=Exists(
-                Favorite.objects.filter(
-                    user_id=user_id, recipe__pk=OuterRef('pk')
+    def add_read_relations(self, user_id=None):
+        authors = User.objects.all()
+        if user_id:
+            authors = authors.annotate(
+                is_subscribed=Exists(
+                    Subscription.objects.filter(
+                        subscriber_id=user_id, author=OuterRef('pk')
+                    )
                 )
+            )
+        return self.prefetch_related(
+            Prefetch('author', queryset=authors),
+            'tags',
+            Prefetch(
+                'recipeingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient')
             ),
-            is_in_shopping_cart=Exists(
-                Cart.objects.filter(
-                    user_id=user_id, recipe__pk=OuterRef('pk')
-                )
+        )
+
+    def first_by_author(self, author_ids, limit=None):
+        ranked = self.filter(author_id__in=author_ids).annotate(
+            recipe_rank=Window(
+                expression=RowNumber(),
+                partition_by=F('author'),
+                order_by=[F(field).asc() for field in Recipe._meta.ordering],
             ),
+        ).order_by()
+        sql, params = ranked.query.sql_with_params()
+        if limit is None:
+            return self.raw(
+                f'SELECT * FROM ({sql}) ranked ORDER BY recipe_rank', params)
+        return self.raw(
+            f'SELECT * FROM ({sql}) ranked WHERE recipe_rank <= %s '
+            f'ORDER BY recipe_rank',
+            (*params, limit)
         )
 
 
+def count_related(model, field):
+    return Coalesce(
+        Subquery(
+            model._default_manager.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(total=Count('pk')).values('total')
+        ),
+        0
+    )
+
+
 class Recipe(models.Model):
     tags = models.ManyToManyField(
         Tag,
@@ -108,6 +144,12 @@ class Recipe(models.Model):
         null=True,
         default=None
     )
+    image_renditions = models.JSONField(
+        verbose_name='Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         verbose_name='Описание рецепта',
     )
@@ -124,11 +166,21 @@ class Recipe(models.Model):
     )
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации', auto_now_add=True, db_index=True)
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Счетчик избранных', default=0, editable=False)
+    carts_count = models.PositiveIntegerField(
+        verbose_name='Счетчик корзин', default=0, editable=False)
 
     custom_objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('pub_date', 'name', 'author', 'cooking_time')
+        indexes = [
+            models.Index(fields=('pub_date', 'id'),
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=('author', 'pub_date', 'id'),
+                         name='recipe_author_pub_date_idx'),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -163,6 +215,35 @@ class Subscription(models.Model):
         return f'{self.subscriber} подписан на {self.author}'
 
 
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Читатель ленты')
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт')
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'recipe'),
+                                    name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(fields=('user', '-pub_date', '-recipe'),
+                         name='feed_user_pub_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'Рецепт {self.recipe} в ленте {self.user}'
+
+
 class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(
         Recipe,
@@ -227,6 +308,34 @@ class Cart(BaseUserRecipe):
         return f'Рецепт {self.recipe} в корзине {self.user}'
 
 
+class CartIngredient(models.Model):
+    # Сводка корзины: сумма каждого продукта по всем рецептам в корзине
+    # пользователя. Поддерживается api.carts при изменении корзины и
+    # состава рецептов, чтобы выгрузка не агрегировала ингредиенты заново.
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients',
+        verbose_name='Пользователь')
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients',
+        verbose_name='Продукт')
+    total = models.PositiveIntegerField(verbose_name='Количество')
+
+    class Meta:
+        verbose_name = 'Продукт корзины'
+        verbose_name_plural = 'Продукты корзины'
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'ingredient'),
+                                    name='unique_cart_ingredient'),
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} в корзине {self.user}'
+
+
 class Favorite(BaseUserRecipe):
     class Meta:
         verbose_name = 'Избранный'
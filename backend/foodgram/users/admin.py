@@ -21,10 +21,6 @@ class UserAdmin(BaseUserAdmin):
     list_filter = ('username', 'email',)
     list_display_links = ('id', 'username', 'email',)
 
-    @admin.display(description='Счетчик рецептов')
-    def recipes_count(self, obj):
-        return obj.recipes.all().count()
-
     @admin.display(description='Счетчик подписчиков')
     def subscribers_count(self, obj):
         return obj.following.all().count()
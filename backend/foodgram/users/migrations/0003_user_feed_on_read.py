@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='feed_on_read',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Рецепты попадают в ленту при чтении'),
+        ),
+    ]
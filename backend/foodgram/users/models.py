@@ -36,6 +36,16 @@ class User(AbstractUser):
         _('password'),
         max_length=settings.LENGTH150,
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Счетчик рецептов',
+        default=0,
+        editable=False,
+    )
+    feed_on_read = models.BooleanField(
+        verbose_name='Рецепты попадают в ленту при чтении',
+        default=False,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Пользователь'